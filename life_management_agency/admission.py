@@ -0,0 +1,368 @@
+"""
+Admission control and per-user fair sharing for chat requests.
+
+At most max_concurrency requests run the agent pipeline at once, and at
+most max_user_concurrency of them for any one user. Each user has a token
+bucket limiting how fast they may send requests, and a queue of their own
+waiting requests. Free slots are handed out across the users' queues by
+deficit round-robin, where a request costs that user's average service
+time, so a user with a burst of requests (or slow ones) gets the same share
+of the pipeline as everyone else instead of pushing them to the back of a
+single FIFO. Waiting is bounded: a request that is over its user's rate,
+finds the queues full, or waits longer than queue_timeout is rejected right
+away with a Retry-After estimate instead of adding to the backlog.
+"""
+
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from life_management_agency import metrics
+from life_management_agency.deadline import bounded
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries a suggested Retry-After in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Allows bursts of up to capacity requests, refilled at rate requests per second."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, otherwise the seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def level(self) -> float:
+        self._refill()
+        return self.tokens
+
+class _UserState:
+    """One user's rate limit, queue, scheduling state and usage."""
+
+    __slots__ = ('bucket', 'waiters', 'active', 'deficit', 'has_turn', 'service_seconds',
+                 'admitted', 'rejected', 'busy_seconds', 'last_seen')
+
+    def __init__(self, bucket: TokenBucket, service_seconds: float):
+        self.bucket = bucket
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.deficit = 0.0
+        self.has_turn = False
+        # Moving average of this user's request duration: the DRR cost of their requests
+        self.service_seconds = service_seconds
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self.busy_seconds = 0.0
+        self.last_seen = time.time()
+
+class AdmissionController:
+    """Global and per-user concurrency caps, per-user rate limits and a fair-share wait queue."""
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, queue_timeout: float = 10.0,
+                 max_user_concurrency: Optional[int] = None, max_user_queue: int = 8,
+                 user_rate: float = 0.5, user_burst: int = 10, max_users: int = 10000):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # By default one user can hold at most a quarter of the pipeline
+        self.max_user_concurrency = max_user_concurrency or max(1, max_concurrency // 4)
+        self.max_user_queue = max_user_queue
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self._active = 0
+        self._queued = 0
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        # Users with waiting requests, in deficit round-robin order
+        self._round: Deque[str] = deque()
+        # Moving averages used for the DRR quantum, Retry-After and the load report
+        self._service_seconds = 5.0
+        self._queue_seconds = 0.0
+
+    @asynccontextmanager
+    async def admit(self, user: str = "user", deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Hold a pipeline slot for the duration of the block, or raise
+        AdmissionRejected. A request never waits in the queue past its deadline.
+        """
+        state = await self._acquire(user, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_seconds += 0.1 * (elapsed - self._service_seconds)
+            state.service_seconds += 0.2 * (elapsed - state.service_seconds)
+            state.busy_seconds += elapsed
+            self._release(state)
+
+    def _user(self, user: str) -> _UserState:
+        state = self._users.get(user)
+        if state is None:
+            state = self._users[user] = _UserState(TokenBucket(self.user_rate, self.user_burst), self._service_seconds)
+            self._prune_users()
+        else:
+            self._users.move_to_end(user)
+        state.last_seen = time.time()
+        return state
+
+    def _prune_users(self) -> None:
+        # Forget the least recently seen idle users beyond max_users
+        excess = len(self._users) - self.max_users
+        for user in list(self._users):
+            if excess <= 0:
+                break
+            state = self._users[user]
+            if not state.active and not state.waiters:
+                del self._users[user]
+                excess -= 1
+
+    async def _acquire(self, user: str, deadline: Optional[float] = None) -> _UserState:
+        state = self._user(user)
+        wait = state.bucket.take()
+        if wait > 0:
+            self._reject(state, 'rate_limited', max(1, math.ceil(wait)))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._enqueue(user, state, waiter)
+        self._dispatch()
+        if waiter.done():
+            self._admitted(state, 0.0)
+            return state
+
+        if len(state.waiters) > self.max_user_queue:
+            self._discard(user, state, waiter)
+            self._reject(state, 'user_queue_full')
+        if self._queued > self.max_queue and not self._evict_heaviest(user, state):
+            self._discard(user, state, waiter)
+            self._reject(state, 'queue_full')
+
+        enqueued = time.monotonic()
+        timeout = bounded(self.queue_timeout, deadline)
+        try:
+            await asyncio.wait_for(waiter, max(0.0, timeout))
+        except asyncio.TimeoutError:
+            self._discard(user, state, waiter)
+            self._reject(state, 'queue_timeout' if timeout >= self.queue_timeout else 'deadline')
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # A slot was handed over just as we were cancelled: pass it on
+                self._release(state)
+            self._discard(user, state, waiter)
+            raise
+        self._admitted(state, time.monotonic() - enqueued)
+        return state
+
+    def _enqueue(self, user: str, state: _UserState, waiter: asyncio.Future) -> None:
+        if not state.waiters:
+            self._round.append(user)
+        state.waiters.append(waiter)
+        self._queued += 1
+
+    def _discard(self, user: str, state: _UserState, waiter: asyncio.Future) -> None:
+        try:
+            state.waiters.remove(waiter)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not state.waiters:
+            self._leave_round(user, state)
+
+    def _leave_round(self, user: str, state: _UserState) -> None:
+        try:
+            self._round.remove(user)
+        except ValueError:
+            pass
+        state.deficit = 0.0
+        state.has_turn = False
+
+    def _evict_heaviest(self, user: str, state: _UserState) -> bool:
+        """
+        With the queue full, make room by rejecting the newest request of the
+        user with the most queued requests, if they have clearly more than this one.
+        """
+        heaviest_user = max(self._round, key=lambda u: len(self._users[u].waiters), default=None)
+        if heaviest_user is None or heaviest_user == user:
+            return False
+        heaviest = self._users[heaviest_user]
+        if len(heaviest.waiters) <= len(state.waiters) + 1:
+            return False
+        evicted = heaviest.waiters.pop()
+        self._queued -= 1
+        if not heaviest.waiters:
+            self._leave_round(heaviest_user, heaviest)
+        self._count_rejection(heaviest, 'evicted')
+        evicted.set_exception(AdmissionRejected('evicted', self.retry_after()))
+        return True
+
+    def _next_waiter(self) -> Tuple[Optional[_UserState], Optional[asyncio.Future]]:
+        """Deficit round-robin over the users with waiting requests."""
+        quantum = max(self._service_seconds, 0.001)
+        capped_in_a_row = 0
+        while self._round and capped_in_a_row < len(self._round):
+            user = self._round[0]
+            state = self._users[user]
+            if state.active >= self.max_user_concurrency:
+                # Not eligible this round; it does not accumulate credit while capped
+                state.has_turn = False
+                self._round.rotate(-1)
+                capped_in_a_row += 1
+                continue
+            capped_in_a_row = 0
+            if not state.has_turn:
+                state.deficit += quantum
+                state.has_turn = True
+            if state.deficit >= state.service_seconds:
+                state.deficit -= state.service_seconds
+                waiter = state.waiters.popleft()
+                self._queued -= 1
+                if not state.waiters:
+                    self._leave_round(user, state)
+                return state, waiter
+            state.has_turn = False
+            self._round.rotate(-1)
+        return None, None
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting requests in fair-share order."""
+        while self._active < self.max_concurrency:
+            state, waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._active += 1
+            state.active += 1
+            waiter.set_result(None)
+
+    def _release(self, state: _UserState) -> None:
+        self._active -= 1
+        state.active -= 1
+        self._dispatch()
+
+    def _admitted(self, state: _UserState, waited: float) -> None:
+        self._queue_seconds += 0.1 * (waited - self._queue_seconds)
+        state.admitted += 1
+        metrics.increment('admission.admitted')
+
+    def _count_rejection(self, state: _UserState, reason: str) -> None:
+        state.rejected[reason] = state.rejected.get(reason, 0) + 1
+        metrics.increment(f'admission.rejected_{reason}')
+
+    def _reject(self, state: _UserState, reason: str, retry_after: Optional[int] = None) -> None:
+        self._count_rejection(state, reason)
+        raise AdmissionRejected(reason, retry_after or self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free for a new request."""
+        backlog = self._queued + 1
+        return max(1, math.ceil(self._service_seconds * backlog / self.max_concurrency))
+
+    def user_stats(self, user: str) -> Optional[Dict[str, Any]]:
+        """One user's current usage, or None for a user not seen recently."""
+        state = self._users.get(user)
+        if state is None:
+            return None
+        return {
+            'user': user,
+            'active': state.active,
+            'queued': len(state.waiters),
+            'admitted': state.admitted,
+            'rejected': dict(state.rejected),
+            'busy_seconds': round(state.busy_seconds, 3),
+            'avg_service_seconds': round(state.service_seconds, 3),
+            'rate_tokens': round(state.bucket.level(), 2),
+            'last_seen': state.last_seen
+        }
+
+    def usage(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Usage of the busiest users, by pipeline time consumed."""
+        users = sorted(self._users, key=lambda u: self._users[u].busy_seconds, reverse=True)[:limit]
+        return [self.user_stats(user) for user in users]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': self._active,
+            'queued': self._queued,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'utilization': self._active / self.max_concurrency,
+            'avg_service_seconds': round(self._service_seconds, 3),
+            'avg_queue_seconds': round(self._queue_seconds, 3),
+            'retry_after': self.retry_after(),
+            'users': len(self._users),
+            'users_waiting': len(self._round),
+            'max_user_concurrency': self.max_user_concurrency,
+            'max_user_queue': self.max_user_queue,
+            'user_rate_per_minute': self.user_rate * 60,
+            'user_burst': self.user_burst
+        }
+
+_admission_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller, configured from the environment."""
+    global _admission_controller
+    if _admission_controller is None:
+        max_user_concurrency = os.getenv('ADMISSION_USER_CONCURRENCY')
+        _admission_controller = AdmissionController(
+            max_concurrency=int(os.getenv('ADMISSION_MAX_CONCURRENCY', '16')),
+            max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', '64')),
+            queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10')),
+            max_user_concurrency=int(max_user_concurrency) if max_user_concurrency else None,
+            max_user_queue=int(os.getenv('ADMISSION_USER_QUEUE', '8')),
+            user_rate=float(os.getenv('ADMISSION_USER_RATE_PER_MINUTE', '30')) / 60,
+            user_burst=int(os.getenv('ADMISSION_USER_BURST', '10'))
+        )
+    return _admission_controller
+
+if __name__ == "__main__":
+    # Example usage: one user bursts 40 one-second requests into 4 slots,
+    # while two other users each send a request shortly after
+    async def main():
+        controller = AdmissionController(max_concurrency=4, max_queue=16, queue_timeout=15,
+                                         max_user_concurrency=3, max_user_queue=20, user_rate=1, user_burst=30)
+
+        async def request(user, i, delay=0.0):
+            await asyncio.sleep(delay)
+            started = time.monotonic()
+            try:
+                async with controller.admit(user):
+                    await asyncio.sleep(1)
+                return f"{user} {i}: served in {time.monotonic() - started:.1f}s"
+            except AdmissionRejected as e:
+                return f"{user} {i}: rejected ({e.reason}, retry after {e.retry_after}s)"
+
+        burst = [request("heavy", i) for i in range(40)]
+        others = [request("alice", 0, 0.5), request("bob", 0, 2.5)]
+        results = await asyncio.gather(*burst, *others)
+        for line in results[-2:] + [r for r in results[:-2] if 'served' in r][:5]:
+            print(line)
+        print(sum('rejected' in r for r in results), "rejected")
+        for usage in controller.usage():
+            print(usage)
+
+    asyncio.run(main())
@@ -4,20 +4,34 @@ import os
 import json
 import sys
 import asyncio
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Awaitable, Optional
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
 # Import agents using absolute imports
 from life_management_agency.master_agent.master_agent import MasterAgent
 from life_management_agency.knowledge_agent.knowledge_agent import KnowledgeAgent
+from life_management_agency.knowledge_agent.knowledge_index import get_knowledge_index
 from life_management_agency.health_agent.health_agent import HealthAgent
 from life_management_agency.lifestyle_agent.lifestyle_agent import LifestyleAgent
 from life_management_agency.social_media_agent.social_media_agent import SocialMediaAgent
 from life_management_agency.personal_coach_agent.personal_coach_agent import PersonalCoachAgent
 from life_management_agency.family_coach_agent.family_coach_agent import FamilyCoachAgent
+from life_management_agency import metrics
+from life_management_agency.envelope import AgentRequest, AgentResponse, Context
+from life_management_agency.profile_store import get_profile_store
+from life_management_agency.context_snapshot import get_context_snapshots
+from life_management_agency.admission import AdmissionRejected, get_admission_controller
+from life_management_agency.degraded_mode import get_degraded_mode
+from life_management_agency.deadline import deadline_after
+from life_management_agency.usage_accounting import BudgetExceeded, get_usage_ledger
+from life_management_agency.routes.profile import router as profile_router
+from life_management_agency.routes.profiling import router as profiling_router
+from life_management_agency.profiling import ProfilingMiddleware, get_cpu_profile_store, profiling_settings
+from life_management_agency.serialization import AgencyResponse, CompressionMiddleware, ContentNegotiationMiddleware
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +39,16 @@ load_dotenv()
 class ChatRequest(BaseModel):
     message: str
     user: str = "user"
+    mode: Optional[str] = None  # 'full', 'express' or 'auto'; defaults to MASTER_AGENT_MODE
+    timeout: Optional[float] = Field(None, gt=0, allow_inf_nan=False)  # Seconds the client will wait; defaults to REQUEST_DEADLINE_SECONDS
+
+class ChatFrame(ChatRequest):
+    """A frame received on /ws/chat: a message to start, or a cancel for one in flight."""
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    id: str
+    type: Optional[str] = None  # 'cancel' aborts the message with this id
+    message: Optional[str] = None  # Required unless type is 'cancel'
 
 class LifeManagementAgency:
     def __init__(self):
@@ -72,37 +96,65 @@ class LifeManagementAgency:
         for agent in self.agents.values():
             agent.set_agency(self)
 
-    async def process_message(self, message: str, user: str) -> Dict[str, Any]:
+    async def process_message(self, message: str, user: str, on_agent_response=None, mode: Optional[str] = None,
+                              deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Process a message once it is admitted. Every entry point (the HTTP and
+        WebSocket routes and the Gradio UI) comes through here, so daily budgets,
+        per-user rate limits and fair-share queueing apply to all of them.
+        Raises BudgetExceeded when the user or the agency is over budget, and
+        AdmissionRejected when the request is shed.
+        """
+        # Refuse users (or the agency) that have used up today's budget before they queue
+        get_usage_ledger().check(user)
+        if deadline is None:
+            # Callers without a deadline of their own get the default one, starting
+            # now so that time spent queued counts against it
+            deadline = deadline_after()
+        async with get_admission_controller().admit(user, deadline):
+            return await self._process_admitted(message, user, on_agent_response, mode, deadline)
+
+    async def _process_admitted(self, message: str, user: str, on_agent_response, mode: Optional[str],
+                                deadline: float) -> Dict[str, Any]:
         try:
-            # Process request through master agent
-            response = await self.master_agent.process_request({
-                'message': message,
-                'user': user,
-                'context': {
-                    'session_user': user,
-                    'timestamp': str(asyncio.get_event_loop().time())
-                }
-            })
+            context = {
+                'session_user': user,
+                'timestamp': str(asyncio.get_event_loop().time())
+            }
+            # Preferences come from the profile cache, never from disk
+            preferences = get_profile_store().cached_preferences(user)
+            if preferences:
+                context['user_preferences'] = preferences
+
+            # Process request through master agent; the context dict becomes the
+            # shared root layer every agent reads from. Every LLM call it makes
+            # is accounted to this request and user.
+            with get_usage_ledger().request_scope(user) as request_usage:
+                response = await self.master_agent.process_request(
+                    AgentRequest(message, user, Context(context), mode, deadline),
+                    on_agent_response=on_agent_response
+                )
 
             # Extract metadata
-            involved_agents = response.get('metadata', {}).get('involved_agents', ['master_agent'])
+            metadata = response.metadata
+            involved_agents = metadata.get('involved_agents', ['master_agent'])
             if isinstance(involved_agents, str):
                 involved_agents = [involved_agents]
 
-            thought_process = response.get('metadata', {}).get('thought_process', [])
+            thought_process = metadata.get('thought_process', [])
             if not isinstance(thought_process, list):
                 thought_process = [str(thought_process)]
 
-            # Get response message
-            response_message = response.get('message', '')
-            if not response_message and 'response' in response:
-                response_message = response['response']
-
             return {
-                'message': response_message,
+                'message': response.message or '',
                 'metadata': {
                     'involved_agents': involved_agents,
-                    'thought_process': thought_process
+                    'thought_process': thought_process,
+                    'synthesis': metadata.get('synthesis'),
+                    'mode': metadata.get('mode'),
+                    'degraded': metadata.get('degraded', False),
+                    'deadline_cut': metadata.get('deadline_cut', []),
+                    'usage': request_usage.to_dict()
                 }
             }
 
@@ -116,8 +168,47 @@ class LifeManagementAgency:
                 }
             }
 
+    async def stream_message(self, message: str, user: str, mode: Optional[str] = None,
+                             deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a message and yield events as they become available: one
+        'agent_response' event per specialist agent, then a 'final' event
+        carrying the same payload as process_message. Raises what
+        process_message raises, such as BudgetExceeded or AdmissionRejected.
+        """
+        events = asyncio.Queue()
+
+        async def on_agent_response(agent_name: str, response: AgentResponse):
+            await events.put({
+                'type': 'agent_response',
+                'agent': agent_name,
+                'message': response.message or '',
+                'metadata': response.metadata.to_dict()
+            })
+
+        async def run():
+            try:
+                result = await self.process_message(message, user, on_agent_response=on_agent_response, mode=mode, deadline=deadline)
+            except Exception as e:
+                await events.put(e)
+                return
+            await events.put({'type': 'final', **result})
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+                if event['type'] == 'final':
+                    break
+        finally:
+            # Stop in-flight work if the consumer goes away early
+            task.cancel()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=AgencyResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -127,25 +218,261 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')))
+
+# CPU profiling is only installed when configured, so it costs nothing otherwise.
+# Added last, it is outermost and also sees serialization and compression.
+_profiling = profiling_settings()
+if _profiling['enabled']:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=get_cpu_profile_store(),
+        admin_token=_profiling['admin_token'],
+        sample_rate=_profiling['sample_rate'],
+        interval=_profiling['interval']
+    )
+
+app.include_router(profile_router)
+app.include_router(profiling_router)
 
 # Initialize agency
 agency = None
+background_tasks = []
 
 @app.on_event("startup")
 async def startup_event():
     global agency
     agency = LifeManagementAgency()
+    await agency.social_media_agent.scheduler.start()
+    # Warm the profile cache so agents read preferences without disk I/O
+    await asyncio.to_thread(get_profile_store().load_all)
+    # Likewise for the user data snapshot attached to agent prompts
+    await asyncio.to_thread(get_context_snapshots().load)
+    # And the knowledge index, so the first retrieval does not load it from disk
+    await asyncio.to_thread(get_knowledge_index)
+    # Today's usage, so budgets survive a restart
+    await asyncio.to_thread(get_usage_ledger().load)
+
+    # Poll podcast feeds in the background when any are configured
+    social_media_agent = agency.social_media_agent
+    if social_media_agent.feed_ingestor.feed_urls:
+        async def on_episode(episode):
+            social_media_agent.handle_new_episode(episode=episode)
+        background_tasks.append(asyncio.create_task(social_media_agent.feed_ingestor.watch(
+            on_episode, interval=float(os.getenv('PODCAST_POLL_INTERVAL', '900'))
+        )))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    if agency is not None:
+        await agency.social_media_agent.scheduler.stop()
+
+def _overloaded_response(error: AdmissionRejected) -> AgencyResponse:
+    # Over the user's own rate limit is 429; shed because the server is busy is 503
+    return AgencyResponse(
+        {'detail': str(error), 'reason': error.reason, 'retry_after': error.retry_after},
+        status_code=429 if error.reason == 'rate_limited' else 503,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+def _budget_response(error: BudgetExceeded) -> AgencyResponse:
+    return AgencyResponse(
+        {'detail': str(error), 'reason': 'budget_exceeded', 'scope': error.scope, 'retry_after': error.retry_after},
+        status_code=429,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable[Any]) -> Optional[Any]:
+    """
+    Await work, cancelling it (and the LLM calls it has in flight) if the
+    client disconnects first. Returns None when the client went away.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def disconnected():
+        # The body has already been read, so the next message is the disconnect
+        while (await http_request.receive())['type'] != 'http.disconnect':
+            pass
+
+    watcher = asyncio.create_task(disconnected())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if not task.cancelled():
+        return task.result()
+    metrics.increment('cancellation.client_disconnects')
+    return None
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    if agency is None:
+        raise HTTPException(status_code=500, detail="Agency not initialized")
+
+    # The deadline starts now, so time spent queued counts against it
+    deadline = deadline_after(request.timeout)
+
+    async def run():
+        # process_message refuses users over budget, sheds load before it reaches
+        # the agents and shares the pipeline fairly between users
+        return await agency.process_message(request.message, request.user, mode=request.mode, deadline=deadline)
+
     try:
-        if agency is None:
-            raise HTTPException(status_code=500, detail="Agency not initialized")
-        response = await agency.process_message(request.message, request.user)
-        return response
+        response = await _cancel_on_disconnect(http_request, run())
+        if response is None:
+            # Nobody is listening; 499 is the conventional status for a closed client
+            return Response(status_code=499)
+        return AgencyResponse(response)
+    except AdmissionRejected as e:
+        return _overloaded_response(e)
+    except BudgetExceeded as e:
+        return _budget_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/load")
+async def get_load():
+    """Current admission state (running and queued pipelines, the Retry-After a shed request would get) and LLM health."""
+    return AgencyResponse({**get_admission_controller().stats(), 'degraded': get_degraded_mode().stats()})
+
+@app.get("/load/users")
+async def get_user_load(limit: int = 50):
+    """Per-user usage of the pipeline, busiest users first."""
+    return AgencyResponse({'users': get_admission_controller().usage(limit)})
+
+@app.get("/load/users/{user}")
+async def get_user_usage(user: str):
+    """One user's usage: running and queued requests, admissions, rejections and remaining rate limit."""
+    usage = get_admission_controller().user_stats(user)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="No recent activity for this user")
+    return AgencyResponse(usage)
+
+@app.get("/usage")
+async def get_usage(limit: int = 20):
+    """Token and cost totals by agent and model since startup, today's totals with the biggest users, and the budgets."""
+    return AgencyResponse(get_usage_ledger().summary(limit))
+
+@app.get("/usage/users/{user}")
+async def get_user_token_usage(user: str):
+    """One user's token and cost totals and where they stand against today's budget."""
+    return AgencyResponse(get_usage_ledger().user_summary(user))
+
+@app.get("/metrics")
+async def get_metrics():
+    counters = metrics.snapshot()
+    synthesis = {k.split('.', 1)[1]: v for k, v in counters.items() if k.startswith('synthesis.')}
+    total = sum(synthesis.values())
+    predicted = counters.get('speculation.predicted', 0)
+    return AgencyResponse({
+        'counters': counters,
+        'admission': get_admission_controller().stats(),
+        'cancellation': {
+            'client_disconnects': counters.get('cancellation.client_disconnects', 0),
+            'llm_calls': counters.get('cancellation.llm_calls', 0),
+            'tokens_saved': counters.get('cancellation.tokens_saved', 0)
+        },
+        'degraded': get_degraded_mode().stats(),
+        'usage': get_usage_ledger().summary(0)['totals'],
+        'speculation': {
+            'predicted': predicted,
+            'hits': counters.get('speculation.hits', 0),
+            'misses': counters.get('speculation.misses', 0),
+            'late_starts': counters.get('speculation.late_starts', 0),
+            'hit_rate': counters.get('speculation.hits', 0) / predicted if predicted else 0.0,
+            'wasted_tokens': counters.get('speculation.wasted_tokens', 0)
+        },
+        'synthesis': {
+            'paths': synthesis,
+            'llm_calls_saved': sum(synthesis.get(path, 0) for path in ('default', 'direct', 'local_merge', 'degraded', 'deadline_merge')),
+            'llm_call_rate': synthesis.get('llm', 0) / total if total else 0.0
+        }
+    })
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Persistent chat channel. Clients send {"id", "message", "user"} to start a
+    message and {"type": "cancel", "id"} to abort one; every event sent back
+    carries the id of the message it belongs to. Frames that are not valid
+    ChatFrame objects are answered with an error event and the channel stays open.
+    """
+    await websocket.accept()
+    if agency is None:
+        await websocket.close(code=1011, reason="Agency not initialized")
+        return
+
+    send_lock = asyncio.Lock()
+    in_flight: Dict[str, asyncio.Task] = {}
+
+    async def send(event: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    async def handle(frame: ChatFrame):
+        message_id = frame.id
+        try:
+            deadline = deadline_after(frame.timeout)
+            async with aclosing(agency.stream_message(frame.message, frame.user, frame.mode, deadline)) as events:
+                async for event in events:
+                    await send({'id': message_id, **event})
+        except AdmissionRejected as e:
+            await send({'id': message_id, 'type': 'error', 'detail': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+        except BudgetExceeded as e:
+            await send({'id': message_id, 'type': 'error', 'detail': str(e), 'reason': 'budget_exceeded', 'retry_after': e.retry_after})
+        except asyncio.CancelledError:
+            try:
+                await send({'id': message_id, 'type': 'cancelled'})
+            except Exception:
+                pass  # The socket is already gone
+            raise
+        except Exception as e:
+            await send({'id': message_id, 'type': 'error', 'detail': str(e)})
+        finally:
+            in_flight.pop(message_id, None)
+
+    try:
+        while True:
+            received = await websocket.receive()
+            if received['type'] == 'websocket.disconnect':
+                break
+            # A malformed frame gets an error event; it must not take down the channel or the other messages on it
+            data = None
+            try:
+                data = json.loads(received.get('text') or received.get('bytes') or '')
+                frame = ChatFrame.model_validate(data)
+            except ValidationError as e:
+                message_id = str(data['id']) if isinstance(data, dict) and 'id' in data else None
+                detail = '; '.join(
+                    f"{'.'.join(map(str, error['loc']))}: {error['msg']}" if error['loc'] else error['msg']
+                    for error in e.errors()
+                )
+                await send({'id': message_id, 'type': 'error', 'detail': f"Invalid frame: {detail}"})
+                continue
+            except ValueError:
+                await send({'id': None, 'type': 'error', 'detail': "Frames must be JSON objects"})
+                continue
+            if frame.type == 'cancel':
+                task = in_flight.get(frame.id)
+                if task is not None:
+                    task.cancel()
+                continue
+            if not frame.id or not frame.message or frame.id in in_flight:
+                await send({'id': frame.id, 'type': 'error', 'detail': "Each message needs a unique 'id' and a 'message'"})
+                continue
+            in_flight[frame.id] = asyncio.create_task(handle(frame))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(in_flight.values()):
+            task.cancel()
+
 def main():
     if os.getenv('OPENAI_API_KEY') is None:
         print("Error: OpenAI API key is not set. Please check your environment variables.")
@@ -1,52 +1,137 @@
-from typing import Dict, Any, List, Optional
-import openai
+from typing import Dict, Any, List, Mapping, Optional, Union
+import time
 import asyncio
 from agency_swarm import Agent
+from life_management_agency.envelope import AgentRequest, AgentResponse, ResponseMetadata
+from life_management_agency.degraded_mode import get_degraded_mode
+from life_management_agency.deadline import DeadlineExceeded, remaining
+from life_management_agency.recording import CassetteMiss, llm_client
+from life_management_agency.usage_accounting import get_usage_ledger
+from life_management_agency import metrics
 
 class BaseAgent(Agent):
     def __init__(self, name: str, description: str, expertise: List[str]):
         super().__init__(name=name, description=description)
         self.expertise = expertise
-        self.client = openai.OpenAI()
+        # Async client for our own completions: cancelling the awaiting task
+        # aborts the HTTP request. Goes through the record/replay cassette when
+        # CASSETTE_MODE is set. self.client stays agency_swarm's sync client,
+        # which Agency uses to create the assistants
+        self.llm = llm_client()
+        # Moving average of completion tokens, used to estimate what a cancelled call saved
+        self._avg_completion_tokens = 0.0
         self.agency = None  # Will be set by Agency class
 
     def set_agency(self, agency):
         """Set the agency instance this agent belongs to"""
         self.agency = agency
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
-
-            request = await self.preprocess_request(request)
-            message = request.get('message', '')
-            context = request.get('context', {})
-            
+                return self._invalid_request_response()
+
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
+
             # Generate response using GPT-4
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": self._format_user_message(message, context)}
-                ]
-            )
+            response = await self._create_completion([
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": self._format_user_message(message, request.context)}
+            ])
 
-            return {
-                'message': response.choices[0].message.content,
-                'metadata': {
-                    'agent': self.name,
-                    'expertise_used': self._get_relevant_expertise(message),
-                    'confidence': self._calculate_confidence(message)
-                }
-            }
+            return AgentResponse(
+                response.choices[0].message.content,
+                ResponseMetadata(
+                    agent=self.name,
+                    expertise_used=self._get_relevant_expertise(message),
+                    confidence=self._calculate_confidence(message),
+                    usage=self._get_usage(response)
+                )
+            )
         except Exception as e:
             return await self.handle_error(e)
 
+    @staticmethod
+    def _invalid_request_response() -> AgentResponse:
+        return AgentResponse(
+            "Invalid request format. Please provide a message.",
+            ResponseMetadata(error='Invalid request')
+        )
+
+    async def _create_completion(self, messages: List[Dict[str, str]], model: str = "gpt-4", **kwargs):
+        """
+        Run a chat completion, reporting its health to degraded mode. If the
+        calling task is cancelled the request is aborted mid-flight. The call
+        is skipped, or cut short, when the request deadline passes. Usage is
+        accounted to the request's user, and a user close to their budget
+        gets the cheaper model.
+        """
+        usage_ledger = get_usage_ledger()
+        model = usage_ledger.model_for(model)
+        degraded_mode = get_degraded_mode()
+        timeout = degraded_mode.call_timeout
+        budget = remaining()
+        cut_by_deadline = budget is not None and budget < timeout
+        if cut_by_deadline:
+            if budget <= 0:
+                metrics.increment('deadline.llm_skipped')
+                raise DeadlineExceeded("Request deadline passed before the LLM call")
+            timeout = budget
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self.llm.chat.completions.create(
+                model=model,
+                messages=messages,
+                **kwargs
+            ), timeout)
+        except asyncio.CancelledError:
+            self._count_cancelled_call(kwargs.get('max_tokens'))
+            raise
+        except asyncio.TimeoutError:
+            if cut_by_deadline:
+                # Our own deadline, not a sign of an unhealthy upstream
+                metrics.increment('deadline.llm_cut')
+                raise DeadlineExceeded(f"LLM call cut short by the request deadline after {timeout:.1f}s") from None
+            degraded_mode.record(time.monotonic() - started, ok=False)
+            raise
+        except CassetteMiss:
+            # A replay without a recording for this call says nothing about upstream health
+            raise
+        except Exception:
+            degraded_mode.record(time.monotonic() - started, ok=False)
+            raise
+        degraded_mode.record(time.monotonic() - started, ok=True)
+        usage = self._get_usage(response)
+        usage_ledger.record(self.name, model, usage)
+        self._avg_completion_tokens += 0.1 * (usage['completion_tokens'] - self._avg_completion_tokens)
+        return response
+
+    def _count_cancelled_call(self, max_tokens: Optional[int]) -> None:
+        """Count an aborted LLM call and the completion tokens it would likely have produced."""
+        estimate = self._avg_completion_tokens
+        if max_tokens:
+            estimate = min(estimate, max_tokens)
+        metrics.increment('cancellation.llm_calls')
+        metrics.increment('cancellation.tokens_saved', round(estimate))
+
+    def _get_usage(self, response) -> Dict[str, int]:
+        """Extract token usage from a completion response."""
+        usage = getattr(response, 'usage', None)
+        return {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+            'total_tokens': getattr(usage, 'total_tokens', 0) or 0
+        }
+
+    def local_recommendations(self, message: str) -> List[str]:
+        """Suggestions from the agent's own tables, used when the LLM is unavailable."""
+        return []
+
+    async def express_context(self, message: str) -> Dict[str, Any]:
+        """Context the agent adds to the single-call express prompt; none by default."""
+        return {}
+
     def _get_system_prompt(self) -> str:
         """Generate the system prompt based on agent's expertise."""
         expertise_str = "\n".join([f"- {exp}" for exp in self.expertise])
@@ -59,12 +144,16 @@ class BaseAgent(Agent):
         If a query falls outside your expertise, acknowledge this and suggest which other agent might be better suited to help.
         """
 
-    def _format_user_message(self, message: str, context: Dict[str, Any]) -> str:
+    def _format_user_message(self, message: str, context: Mapping[str, Any]) -> str:
         """Format the user message with any additional context."""
-        context_str = "\n".join([f"{k}: {v}" for k, v in context.items()])
+        context_str = "\n".join([f"{k}: {v}" for k, v in context.items() if k != 'user_facts'])
+        facts = context.get('user_facts')
+        facts_str = ""
+        if facts:
+            facts_str = "\n        Known Facts About the User:\n" + "\n".join(f"- {fact}" for fact in facts) + "\n"
         return f"""
         User Message: {message}
-
+        {facts_str}
         Additional Context:
         {context_str}
         """
@@ -78,38 +167,32 @@ class BaseAgent(Agent):
         relevant_expertise = self._get_relevant_expertise(message)
         return min(1.0, len(relevant_expertise) / len(self.expertise))
 
-    async def handle_error(self, error: Exception) -> Dict[str, Any]:
+    async def handle_error(self, error: Exception) -> AgentResponse:
         """Handle any errors that occur during processing."""
         error_msg = str(error)
         if "MasterAgent' object has no attribute 'agency'" in error_msg:
             error_msg = "Agent initialization incomplete. Please try again."
         
-        return {
-            'message': f"I apologize, but I encountered an error while processing your request: {error_msg}",
-            'metadata': {
-                'agent': self.name,
-                'error': error_msg,
-                'error_type': type(error).__name__
-            }
-        }
+        return AgentResponse(
+            f"I apologize, but I encountered an error while processing your request: {error_msg}",
+            ResponseMetadata(agent=self.name, error=error_msg, error_type=type(error).__name__)
+        )
 
-    async def validate_request(self, request: Dict[str, Any]) -> bool:
+    async def validate_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> bool:
         """Validate the incoming request."""
+        if isinstance(request, AgentRequest):
+            return True
         required_fields = ['message']
         return all(field in request for field in required_fields)
 
-    async def preprocess_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def preprocess_request(self, request: AgentRequest) -> AgentRequest:
         """Preprocess the request before handling."""
-        # Clean and normalize the message
-        if 'message' in request:
-            request['message'] = request['message'].strip()
-        return request
+        # Clean and normalize the message; unchanged requests are passed through as-is
+        return request.with_message(request.message.strip())
 
-    async def postprocess_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+    async def postprocess_response(self, response: AgentResponse) -> AgentResponse:
         """Postprocess the response before sending."""
-        # Ensure all required fields are present
-        if 'message' not in response:
-            response['message'] = ''
-        if 'metadata' not in response:
-            response['metadata'] = {}
+        # AgentResponse always carries a message and metadata
+        if response.message is None:
+            response.message = ''
         return response
@@ -0,0 +1,245 @@
+"""
+Cached snapshot of the user's own data for agent prompts.
+
+The snapshot condenses the fitness log, the wellness memory and the family
+log into a few lines: today's metrics, recent activities, recent family
+time and upcoming family events. The logs are read once at startup; after
+that the tools report each write here, which updates the in-memory copy
+and invalidates only the affected section. The family section is the same
+for everyone and rendered once; the fitness and wellness sections are kept
+per user for the most recently active users only. Building a snapshot on the
+request path never touches the disk. Family events move from upcoming to
+recent as they pass, and the family log is queried again in a background
+thread when the date changes, so the upcoming window stays current.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from life_management_agency.family_coach_agent.family_log_store import get_family_log_store
+
+HEALTH_DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "health")
+
+MINDFULNESS_ACTIVITIES = ("meditation", "yoga", "mindfulness")
+
+def _read_json_list(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return []
+    return data if isinstance(data, list) else []
+
+def _day(timestamp: str) -> str:
+    return (timestamp or "")[:10]
+
+def _tomorrow() -> str:
+    return datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()).isoformat()
+
+class ContextSnapshotService:
+    """In-memory per-user snapshot of fitness, wellness and family data, invalidated by section."""
+
+    SECTIONS = ('fitness', 'wellness', 'family')
+
+    def __init__(self, health_dir: str = HEALTH_DATA_DIR, family_store=None,
+                 recent_limit: int = 3, upcoming_days: int = 14, max_users: int = 10000):
+        self.health_dir = health_dir
+        self.family_store = family_store
+        self.recent_limit = recent_limit
+        self.upcoming_days = upcoming_days
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._fitness: List[Dict[str, Any]] = []
+        self._wellness: List[Dict[str, Any]] = []
+        self._family_recent: List[Dict[str, Any]] = []
+        self._family_upcoming: List[Dict[str, Any]] = []
+        # Day the family lists were queried for, and whether a re-query is running
+        self._family_day: Optional[str] = None
+        self._family_refreshing = False
+        # Rendered sections as (valid_until, lines): family is shared, the daily
+        # sections are per user and least recently used users are evicted
+        self._family_cache: Optional[tuple] = None
+        self._daily_cache: Dict[str, "OrderedDict[str, tuple]"] = {'fitness': OrderedDict(), 'wellness': OrderedDict()}
+
+    # Loading and write-path updates
+
+    def load(self) -> None:
+        """Read the logs once. Called at startup, off the request path."""
+        fitness = _read_json_list(os.path.join(self.health_dir, "fitness_log.json"))
+        wellness = _read_json_list(os.path.join(self.health_dir, "fitness_memory.json"))
+        recent, upcoming = self._query_family()
+        with self._lock:
+            self._fitness = fitness
+            self._wellness = wellness
+            self._family_recent, self._family_upcoming = recent, upcoming
+            self._family_day = datetime.now().date().isoformat()
+            for section in self.SECTIONS:
+                self._invalidate(section)
+            self._loaded = True
+
+    def _refresh_family(self, day: str) -> None:
+        """Query the family log again for a new day; runs in a background thread."""
+        try:
+            recent, upcoming = self._query_family()
+            with self._lock:
+                self._family_recent, self._family_upcoming = recent, upcoming
+                self._family_day = day
+                self._invalidate('family')
+        except Exception as e:
+            print(f"Error refreshing family snapshot: {str(e)}")
+        finally:
+            self._family_refreshing = False
+
+    def _query_family(self):
+        store = self.family_store or get_family_log_store()
+        now = datetime.now()
+        recent = store.between(end=now.isoformat(), limit=self.recent_limit)
+        upcoming = store.between(start=now.isoformat(), end=(now + timedelta(days=self.upcoming_days)).isoformat(),
+                                 limit=self.recent_limit)
+        return recent, list(reversed(upcoming))
+
+    def _invalidate(self, section: str, entry: Optional[Dict[str, Any]] = None) -> None:
+        if section == 'family':
+            self._family_cache = None
+        elif entry is not None and 'user' in entry:
+            self._daily_cache[section].pop(entry['user'], None)
+        else:
+            # Entries without a user belong to everyone
+            self._daily_cache[section] = OrderedDict()
+
+    def record_fitness_activity(self, entry: Dict[str, Any]) -> None:
+        """Called by FitnessTrackerTool after it logs an activity."""
+        with self._lock:
+            self._fitness.append(entry)
+            self._invalidate('fitness', entry)
+
+    def record_wellness_activity(self, entry: Dict[str, Any]) -> None:
+        """Called by MemoryTool after it stores an activity."""
+        with self._lock:
+            self._wellness.append(entry)
+            self._invalidate('wellness', entry)
+
+    def record_family_entry(self, entry: Dict[str, Any]) -> None:
+        """Called by FamilyRelationshipTool after it records an entry."""
+        now = datetime.now()
+        horizon = (now + timedelta(days=self.upcoming_days)).isoformat()
+        now = now.isoformat()
+        timestamp = entry.get('timestamp', now)
+        with self._lock:
+            if timestamp > horizon:
+                # Outside the upcoming window; picked up by the daily re-query once it is in range
+                return
+            if timestamp > now:
+                self._family_upcoming = sorted(self._family_upcoming + [entry], key=lambda e: e['timestamp'])[:self.recent_limit]
+            else:
+                self._family_recent = ([entry] + self._family_recent)[:self.recent_limit]
+            self._invalidate('family')
+
+    # Request path
+
+    def snapshot(self, user: str = "user") -> str:
+        """The user's snapshot as a few compact lines; empty when there is no data."""
+        if not self._loaded:
+            # Normally warmed at startup; this only happens for standalone use
+            self.load()
+        now = datetime.now()
+        today = now.date().isoformat()
+        now = now.isoformat()
+        with self._lock:
+            if self._family_day != today and not self._family_refreshing:
+                # The upcoming window moved; re-query off the request path and
+                # render from the lists we have until it finishes
+                self._family_refreshing = True
+                threading.Thread(target=self._refresh_family, args=(today,), daemon=True).start()
+            lines = []
+            for section in self.SECTIONS:
+                lines.extend(self._cached(section, user, today, now))
+        return "\n".join(lines)
+
+    def _cached(self, section: str, user: str, today: str, now: str) -> List[str]:
+        if section == 'family':
+            if self._family_cache is None or now >= self._family_cache[0]:
+                self._family_cache = self._render_family(now)
+            return self._family_cache[1]
+        cache = self._daily_cache[section]
+        cached = cache.get(user)
+        if cached is None or now >= cached[0]:
+            cached = cache[user] = (_tomorrow(), self._render_daily(section, user, today))
+            if len(cache) > self.max_users:
+                cache.popitem(last=False)
+        cache.move_to_end(user)
+        return cached[1]
+
+    @staticmethod
+    def _owned_by(entry: Dict[str, Any], user: str) -> bool:
+        # Entries written without a user belong to the single local user
+        return entry.get('user', user) == user
+
+    def _render_daily(self, section: str, user: str, today: str) -> List[str]:
+        if section == 'fitness':
+            entries = [e for e in self._fitness if self._owned_by(e, user)]
+            if not entries:
+                return []
+            active = sum(e.get('duration_minutes', 0) or 0 for e in entries if _day(e.get('timestamp')) == today)
+            recent = ", ".join(
+                f"{e.get('activity')} {e.get('duration_minutes')} min ({_day(e.get('timestamp'))})"
+                for e in entries[-self.recent_limit:][::-1]
+            )
+            return [f"Active minutes today: {active}", f"Recent activities: {recent}"]
+        if section == 'wellness':
+            entries = [e for e in self._wellness if self._owned_by(e, user)]
+            if not entries:
+                return []
+            mindful = sum(e.get('duration') or 0 for e in entries
+                          if e.get('activity_type') in MINDFULNESS_ACTIVITIES and _day(e.get('timestamp')) == today)
+            return [f"Mindfulness minutes today: {mindful}"]
+        return []
+
+    def _render_family(self, now: str) -> tuple:
+        # Events that have passed since the lists were queried count as recent
+        horizon = (datetime.fromisoformat(now) + timedelta(days=self.upcoming_days)).isoformat()
+        passed = [e for e in self._family_upcoming if e['timestamp'] <= now]
+        recent = sorted(passed + self._family_recent, key=lambda e: e['timestamp'], reverse=True)[:self.recent_limit]
+        upcoming = [e for e in self._family_upcoming if now < e['timestamp'] <= horizon]
+        lines = []
+        if recent:
+            lines.append("Recent family time: " + "; ".join(
+                f"{e['action_type']} with {', '.join(e['family_members'])} ({_day(e['timestamp'])}): {e['description'][:80]}"
+                for e in recent
+            ))
+        if upcoming:
+            lines.append("Upcoming family events: " + "; ".join(
+                f"{_day(e['timestamp'])}: {e['description'][:80]} with {', '.join(e['family_members'])}"
+                for e in upcoming
+            ))
+        # Valid until the next event comes due or the day ends
+        return min([_tomorrow(), *(e['timestamp'] for e in upcoming)]), lines
+
+_context_snapshots: Optional[ContextSnapshotService] = None
+
+def get_context_snapshots() -> ContextSnapshotService:
+    """Return the process-wide context snapshot service."""
+    global _context_snapshots
+    if _context_snapshots is None:
+        _context_snapshots = ContextSnapshotService()
+    return _context_snapshots
+
+if __name__ == "__main__":
+    # Example usage: build a snapshot, then update it through the write path
+    import time
+    service = get_context_snapshots()
+    service.load()
+    print(service.snapshot() or "(no data)")
+    service.record_fitness_activity({"activity": "Running", "duration_minutes": 30, "timestamp": datetime.now().isoformat()})
+    start = time.perf_counter()
+    for _ in range(1000):
+        service.snapshot()
+    print(service.snapshot())
+    print(f"snapshot: {(time.perf_counter() - start) * 1000:.3f} us per call")
@@ -0,0 +1,128 @@
+"""
+Rolling conversation memory for chat sessions.
+
+Each session keeps its most recent turns verbatim and folds older turns
+into a running summary. Folding happens in a background task once enough
+turns have aged out of the recent window, so requests never wait on it
+and the prompt carries a bounded amount of history however long the
+session runs.
+"""
+
+import asyncio
+import contextvars
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from life_management_agency import metrics
+
+# Updates a summary with turns that aged out of the recent window
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+class SessionMemory:
+    """Summary plus verbatim recent turns for one session."""
+
+    __slots__ = ('summary', 'turns', 'folding')
+
+    def __init__(self):
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.folding: Optional[asyncio.Task] = None
+
+class ConversationMemory:
+    """
+    Per-session rolling memory. The last recent_turns turns are kept as they
+    were said; once summarize_batch more have accumulated behind them they
+    are handed to the summarizer and removed when the new summary is ready.
+    """
+
+    def __init__(self, summarize: Summarizer, recent_turns: int = 6, summarize_batch: int = 4,
+                 max_turn_chars: int = 2000, max_summary_chars: int = 2000, max_sessions: int = 10000):
+        self.summarize = summarize
+        self.recent_turns = recent_turns
+        self.summarize_batch = summarize_batch
+        self.max_turn_chars = max_turn_chars
+        self.max_summary_chars = max_summary_chars
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+
+    def _session(self, session_id: str) -> SessionMemory:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = SessionMemory()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def context_for(self, session_id: str) -> Dict[str, str]:
+        """Prompt context for a session: its summary and recent turns as text."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return {}
+        context = {}
+        if session.summary:
+            context['conversation_summary'] = session.summary
+        if session.turns:
+            context['recent_conversation'] = "\n".join(
+                f"{turn['role'].capitalize()}: {turn['content']}" for turn in session.turns
+            )
+        return context
+
+    def record_turn(self, session_id: str, user_message: str, assistant_message: str) -> None:
+        """Add an exchange and start folding old turns into the summary if a threshold was crossed."""
+        session = self._session(session_id)
+        session.turns.append({'role': 'user', 'content': user_message[:self.max_turn_chars]})
+        session.turns.append({'role': 'assistant', 'content': assistant_message[:self.max_turn_chars]})
+
+        overflow = len(session.turns) - 2 * self.recent_turns
+        if overflow > 4 * self.summarize_batch:
+            # The summarizer is failing or far behind: fall back to dropping the oldest turns
+            del session.turns[:overflow - 4 * self.summarize_batch]
+            metrics.increment('memory.turns_dropped')
+            overflow = 4 * self.summarize_batch
+        if overflow >= 2 * self.summarize_batch and session.folding is None:
+            # A fresh context, so the fold is not bound by the deadline (or
+            # accounted to the usage) of the request that happened to trigger it
+            session.folding = asyncio.create_task(self._fold(session, overflow), context=contextvars.Context())
+
+    async def _fold(self, session: SessionMemory, count: int) -> None:
+        folded = session.turns[:count]
+        try:
+            summary = await self.summarize(session.summary, folded)
+            # Remove the folded turns that were not dropped in the meantime
+            folded_ids = {id(turn) for turn in folded}
+            session.turns = [turn for turn in session.turns if id(turn) not in folded_ids]
+            session.summary = summary.strip()[:self.max_summary_chars]
+            metrics.increment('memory.summaries')
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+            metrics.increment('memory.summary_errors')
+        finally:
+            session.folding = None
+
+    def summary(self, session_id: str) -> str:
+        session = self._sessions.get(session_id)
+        return session.summary if session else ""
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """Verbatim turns not yet folded into the summary, oldest first."""
+        session = self._sessions.get(session_id)
+        return list(session.turns) if session else []
+
+    def clear(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None and session.folding is not None:
+            session.folding.cancel()
+
+def summary_prompt(summary: str, turns: List[Dict[str, str]], max_words: int = 200) -> List[Dict[str, str]]:
+    """Chat messages asking a model to fold turns into an existing summary."""
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    return [
+        {"role": "system", "content": f"""
+        You maintain a running summary of a conversation between a user and their life management assistant.
+        Update the summary with the new turns. Keep the user's goals, decisions, preferences, people and
+        open questions; drop small talk. Write at most {max_words} words of plain prose.
+        """},
+        {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+    ]
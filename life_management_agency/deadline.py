@@ -0,0 +1,60 @@
+"""
+Per-request deadlines.
+
+A deadline is an absolute time.monotonic() value. The API sets one for
+every request, MasterAgent carries it on the AgentRequest and makes it the
+current deadline while the pipeline runs. Tasks started by the pipeline
+inherit it through the context variable, so LLM calls and tool runs deep
+inside an agent can bound their own waits with remaining() without it
+being threaded through every signature. Background work that outlives the
+request (conversation folding, memory writes, degraded-mode probes) is
+started in a fresh contextvars.Context so it does not inherit the deadline.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Default service-level objective for a request, in seconds
+DEFAULT_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '30'))
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage is skipped or cut short because the request deadline passed."""
+
+def deadline_after(seconds: Optional[float] = None) -> float:
+    """An absolute deadline the given number of seconds from now (the default SLO if None)."""
+    return time.monotonic() + (DEFAULT_DEADLINE_SECONDS if seconds is None else seconds)
+
+def current_deadline() -> Optional[float]:
+    return _current_deadline.get()
+
+def remaining(deadline: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the given or current deadline; None when there is no deadline."""
+    if deadline is None:
+        deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def bounded(timeout: Optional[float], deadline: Optional[float] = None) -> Optional[float]:
+    """The smaller of a timeout and the time left before the deadline."""
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Make deadline the current deadline inside the block and in tasks started from it."""
+    if deadline is None:
+        yield
+        return
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,154 @@
+"""
+Automatic degraded mode for when the upstream LLM is slow or failing.
+
+Every LLM call reports its latency and outcome here. When the error rate
+over the recent window or the average latency crosses its threshold, the
+agency switches to degraded mode: requests are answered in milliseconds
+from the agents' local recommendation tables instead of waiting on the
+LLM, and the responses are marked as degraded. While degraded, a small
+background probe is sent to the LLM every probe_interval seconds; after
+recovery_successes healthy probes in a row the agency switches back.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from life_management_agency import metrics
+
+class DegradedModeController:
+    """Tracks LLM health and decides when requests should skip the LLM."""
+
+    def __init__(self, latency_threshold: float = 20.0, error_threshold: float = 0.5,
+                 window: int = 20, min_samples: int = 4, probe_interval: float = 15.0,
+                 recovery_successes: int = 2, call_timeout: float = 60.0):
+        self.latency_threshold = latency_threshold
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.probe_interval = probe_interval
+        self.recovery_successes = recovery_successes
+        # Upper bound on a single LLM call; a call that hits it counts as an error
+        self.call_timeout = call_timeout
+        self.active = False
+        self.reason: Optional[str] = None
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._latency = 0.0
+        self._since: Optional[float] = None
+        self._last_probe = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._healthy_probes = 0
+
+    # Reports from the LLM call sites
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record one LLM call and switch mode if a threshold was crossed."""
+        if ok:
+            self._latency = latency if not self._outcomes else self._latency + 0.2 * (latency - self._latency)
+        self._outcomes.append(ok)
+        if self.active:
+            return
+        if len(self._outcomes) < self.min_samples:
+            return
+        error_rate = self._outcomes.count(False) / len(self._outcomes)
+        if error_rate >= self.error_threshold:
+            self._enter('errors')
+        elif self._latency >= self.latency_threshold:
+            self._enter('latency')
+
+    def _enter(self, reason: str) -> None:
+        self.active = True
+        self.reason = reason
+        self._since = time.monotonic()
+        self._last_probe = self._since
+        self._healthy_probes = 0
+        metrics.increment('degraded.entered')
+        print(f"Entering degraded mode ({reason})")
+
+    def _exit(self) -> None:
+        self.active = False
+        self.reason = None
+        self._since = None
+        self._outcomes.clear()
+        self._latency = 0.0
+        metrics.increment('degraded.recovered')
+        print("LLM recovered, leaving degraded mode")
+
+    # Recovery
+
+    def maybe_probe(self, probe: Callable[[], Awaitable[Any]]) -> None:
+        """While degraded, start a background probe of the LLM if one is due."""
+        if not self.active or self._probe_task is not None:
+            return
+        if time.monotonic() - self._last_probe < self.probe_interval:
+            return
+        self._last_probe = time.monotonic()
+        # Outlives the request that started it, so it must not inherit its deadline
+        self._probe_task = asyncio.create_task(self._run_probe(probe), context=contextvars.Context())
+
+    async def _run_probe(self, probe: Callable[[], Awaitable[Any]]) -> None:
+        metrics.increment('degraded.probes')
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(probe(), self.latency_threshold)
+            healthy = time.monotonic() - started < self.latency_threshold
+        except Exception as e:
+            print(f"Degraded mode probe failed: {str(e)}")
+            healthy = False
+        finally:
+            self._probe_task = None
+        self._healthy_probes = self._healthy_probes + 1 if healthy else 0
+        if self._healthy_probes >= self.recovery_successes:
+            self._exit()
+
+    def stats(self) -> Dict[str, Any]:
+        error_rate = self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+        return {
+            'active': self.active,
+            'reason': self.reason,
+            'degraded_seconds': round(time.monotonic() - self._since, 1) if self._since is not None else 0.0,
+            'error_rate': round(error_rate, 3),
+            'avg_latency_seconds': round(self._latency, 3),
+            'samples': len(self._outcomes),
+            'latency_threshold': self.latency_threshold,
+            'error_threshold': self.error_threshold,
+            'healthy_probes': self._healthy_probes
+        }
+
+_degraded_mode: Optional[DegradedModeController] = None
+
+def get_degraded_mode() -> DegradedModeController:
+    """Return the process-wide degraded mode controller, configured from the environment."""
+    global _degraded_mode
+    if _degraded_mode is None:
+        _degraded_mode = DegradedModeController(
+            latency_threshold=float(os.getenv('DEGRADED_LATENCY_SECONDS', '20')),
+            error_threshold=float(os.getenv('DEGRADED_ERROR_RATE', '0.5')),
+            probe_interval=float(os.getenv('DEGRADED_PROBE_INTERVAL', '15')),
+            call_timeout=float(os.getenv('LLM_CALL_TIMEOUT', '60'))
+        )
+    return _degraded_mode
+
+if __name__ == "__main__":
+    # Example usage: an upstream that fails for a while, then recovers
+    async def main():
+        controller = DegradedModeController(min_samples=3, probe_interval=0.1)
+        upstream_ok = False
+
+        async def probe():
+            if not upstream_ok:
+                raise RuntimeError("upstream unavailable")
+
+        for _ in range(3):
+            controller.record(0.5, ok=False)
+        print(controller.stats())
+        for step in range(6):
+            upstream_ok = step >= 2
+            await asyncio.sleep(0.15)
+            controller.maybe_probe(probe)
+            await asyncio.sleep(0)
+            print(f"step {step}: upstream {'up' if upstream_ok else 'down'}, degraded={controller.active}")
+
+    asyncio.run(main())
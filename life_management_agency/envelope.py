@@ -0,0 +1,226 @@
+"""
+Typed request/response envelope passed between agents.
+
+Requests and their context are immutable. An agent that needs extra
+context derives a new layer on top of the caller's context instead of
+copying or mutating it, so fan-out to several agents shares one base
+context and no agent can change what another agent sees. Responses are
+owned by the agent that produced them and may be amended in place.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Context(Mapping):
+    """
+    Read-only, layered request context. Lookups fall through to the parent
+    layer. Each layer's values dict is private to it and never mutated.
+    """
+
+    values: Dict[str, Any] = field(default_factory=dict)
+    parent: Optional["Context"] = None
+
+    # Contexts compare by content (as mappings) but hash by identity
+    __hash__ = object.__hash__
+
+    @classmethod
+    def of(cls, values: Optional[Mapping] = None) -> "Context":
+        """Wrap a mapping as a root context; the mapping is copied once here."""
+        if isinstance(values, Context):
+            return values
+        return cls(dict(values or {}))
+
+    def derive(self, values: Optional[Dict[str, Any]] = None, **extra: Any) -> "Context":
+        """
+        A new context layering values over this one without copying it. A
+        values dict passed in is adopted as the new layer, so callers hand
+        over a freshly built dict and do not touch it afterwards.
+        """
+        if values and extra:
+            values = {**values, **extra}
+        values = values or extra
+        if not values:
+            return self
+        return Context(values, self)
+
+    def __getitem__(self, key: str) -> Any:
+        layer = self
+        while layer is not None:
+            if key in layer.values:
+                return layer.values[key]
+            layer = layer.parent
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        layer = self
+        while layer is not None:
+            if key in layer.values:
+                return True
+            layer = layer.parent
+        return False
+
+    def __iter__(self) -> Iterator[str]:
+        # Outer keys first, like a dict built with {**parent, **values}
+        seen = set()
+        layers = []
+        layer = self
+        while layer is not None:
+            layers.append(layer)
+            layer = layer.parent
+        for layer in reversed(layers):
+            for key in layer.values:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"Context({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self}
+
+EMPTY_CONTEXT = Context()
+
+@dataclass(frozen=True, slots=True)
+class AgentRequest:
+    """
+    A message for an agent, with the user it came from and its context.
+    deadline is an absolute time.monotonic() value (see deadline.py).
+    """
+
+    message: str
+    user: str = "user"
+    context: Context = EMPTY_CONTEXT
+    mode: Optional[str] = None
+    deadline: Optional[float] = None
+
+    @classmethod
+    def coerce(cls, request: Union["AgentRequest", Mapping]) -> "AgentRequest":
+        """Accept an AgentRequest or a legacy request dict."""
+        if isinstance(request, AgentRequest):
+            return request
+        return cls(
+            message=request.get('message', ''),
+            user=request.get('user', 'user'),
+            context=Context.of(request.get('context')),
+            mode=request.get('mode'),
+            deadline=request.get('deadline')
+        )
+
+    def with_context(self, values: Optional[Dict[str, Any]] = None, **extra: Any) -> "AgentRequest":
+        """The same request with extra context layered on top (see Context.derive)."""
+        context = self.context.derive(values, **extra)
+        if context is self.context:
+            return self
+        return AgentRequest(self.message, self.user, context, self.mode, self.deadline)
+
+    def with_message(self, message: str) -> "AgentRequest":
+        return self if message == self.message else AgentRequest(message, self.user, self.context, self.mode, self.deadline)
+
+@dataclass(slots=True)
+class ResponseMetadata:
+    """
+    Metadata common to every agent response, plus agent-specific details.
+    Reads and updates accept either kind of key, like the dicts it replaces.
+    """
+
+    agent: Optional[str] = None
+    expertise_used: Optional[List[str]] = None
+    confidence: Optional[float] = None
+    usage: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _METADATA_FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.details.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def update(self, values: Mapping) -> None:
+        for key, value in values.items():
+            if key in _METADATA_FIELDS:
+                setattr(self, key, value)
+            else:
+                self.details[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {name: getattr(self, name) for name in _METADATA_FIELDS if getattr(self, name) is not None}
+        result.update(self.details)
+        return result
+
+_METADATA_FIELDS = ('agent', 'expertise_used', 'confidence', 'usage', 'error', 'error_type')
+
+@dataclass(slots=True)
+class AgentResponse:
+    """An agent's reply and its metadata."""
+
+    message: str
+    metadata: ResponseMetadata = field(default_factory=ResponseMetadata)
+
+    @property
+    def failed(self) -> bool:
+        return self.metadata.error is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'message': self.message, 'metadata': self.metadata.to_dict()}
+
+if __name__ == "__main__":
+    # Allocation comparison for one request fanned out to six agents: each
+    # agent adds its own context and returns a response whose metadata it
+    # then extends, with the previous dict copies versus the envelope
+    import tracemalloc
+
+    base = {
+        'session_user': 'user',
+        'timestamp': '12345.6',
+        'user_preferences': {'language': 'en', 'timezone': 'UTC', 'theme': 'dark'},
+        **{f'history_{i}': f'turn {i}' for i in range(20)}
+    }
+    agents = ['knowledge_agent', 'health_agent', 'lifestyle_agent', 'social_media_agent',
+              'personal_coach_agent', 'family_coach_agent']
+    usage = {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+
+    def with_dicts():
+        results = []
+        for name in agents:
+            context = {**base, 'analysis': {}, 'other_agents': [a for a in agents if a != name]}
+            request = {'message': ' hello ', 'user': 'user', 'context': context}
+            request['message'] = request['message'].strip()
+            context.update({'agent_context': {'mentioned': True}})
+            request = {'message': request['message'], 'context': context}
+            response = {'message': 'reply', 'metadata': {'agent': name, 'expertise_used': [], 'confidence': 0.5, 'usage': usage}}
+            response['metadata'].update({'focus_areas': [], 'recommendations': []})
+            results.append((request, response))
+        return results
+
+    def with_envelope():
+        root = AgentRequest(' hello ', 'user', Context(base)).with_message('hello')
+        results = []
+        for name in agents:
+            request = root.with_context({'analysis': {}, 'other_agents': [a for a in agents if a != name]})
+            request = request.with_context({'agent_context': {'mentioned': True}})
+            response = AgentResponse('reply', ResponseMetadata(agent=name, expertise_used=[], confidence=0.5, usage=usage))
+            response.metadata.update({'focus_areas': [], 'recommendations': []})
+            results.append((request, response))
+        return results
+
+    for label, build in (("dict copies", with_dicts), ("envelope", with_envelope)):
+        build()
+        tracemalloc.start()
+        kept = [build() for _ in range(100)]
+        stats = tracemalloc.take_snapshot().statistics('filename')
+        tracemalloc.stop()
+        blocks = sum(stat.count for stat in stats)
+        size = sum(stat.size for stat in stats)
+        print(f"{label:<12} {blocks / 100:>6.0f} allocations {size / 100:>8.0f} bytes per fan-out")
+        del kept
@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from ..base_agent import BaseAgent
+from ..envelope import AgentRequest, AgentResponse
 
 class FamilyCoachAgent(BaseAgent):
     def __init__(self):
@@ -22,6 +23,12 @@ class FamilyCoachAgent(BaseAgent):
             expertise=expertise
         )
 
+    def local_recommendations(self, message: str) -> List[str]:
+        return [
+            f"{s['activity']} ({s['duration']}): {s['benefit']}"
+            for s in self._generate_activity_suggestions(message)
+        ]
+
     def _get_system_prompt(self) -> str:
         return """
         You are a specialized family and relationships AI agent. Your role is to help users 
@@ -51,31 +58,23 @@ class FamilyCoachAgent(BaseAgent):
         - Family traditions
         """
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             # Validate and preprocess request
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
+                return self._invalid_request_response()
 
-            request = await self.preprocess_request(request)
-            message = request['message']
-            context = request.get('context', {})
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
 
-            # Add family-specific context processing
-            family_context = self._extract_family_context(message)
-            context.update(family_context)
+            # Add family-specific context as a layer over the caller's context
+            request = request.with_context(self._extract_family_context(message))
 
             # Process with base implementation
-            response = await super().process_request({
-                'message': message,
-                'context': context
-            })
+            response = await super().process_request(request)
 
             # Add family-specific metadata
-            response['metadata'].update({
+            response.metadata.update({
                 'relationship_areas': self._identify_relationship_areas(message),
                 'activity_suggestions': self._generate_activity_suggestions(message),
                 'communication_tips': self._generate_communication_tips(message),
@@ -0,0 +1,187 @@
+"""
+Indexed storage for the family relationship log.
+
+Entries live in SQLite with an FTS5 full-text index over descriptions and
+secondary indexes on family member, action type and timestamp, so lookups
+such as "when did I last spend quality time with Sister" stay fast as the
+log grows. An existing family_log.json is imported on first use.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DB_PATH = "family_records/family_log.db"
+LEGACY_LOG_PATH = "family_records/family_log.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    action_type TEXT NOT NULL,
+    description TEXT NOT NULL,
+    family_members TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_action_type ON entries (action_type, timestamp);
+
+CREATE TABLE IF NOT EXISTS entry_members (
+    entry_id INTEGER NOT NULL REFERENCES entries (id),
+    member TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entry_members_member ON entry_members (member, timestamp);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    description, content='entries', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+class FamilyLogStore:
+    """SQLite-backed family log with full-text search and per-member timelines."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, legacy_log_path: Optional[str] = LEGACY_LOG_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if legacy_log_path:
+            self._import_legacy_log(legacy_log_path)
+
+    def _import_legacy_log(self, path: str) -> None:
+        """Import records from the old JSON log into an empty store."""
+        if not os.path.exists(path):
+            return
+        if self._conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone():
+            return
+        try:
+            with open(path, "r") as f:
+                records = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        for record in records:
+            self.add_entry(
+                record.get('action_type', ''),
+                record.get('family_members', []),
+                record.get('description', ''),
+                record.get('timestamp')
+            )
+
+    @staticmethod
+    def _normalize_member(member: str) -> str:
+        return ' '.join(str(member).lower().split())
+
+    def add_entry(self, action_type: str, family_members: List[str], description: str,
+                  timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Record an entry and return it."""
+        timestamp = timestamp or datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (timestamp, action_type, description, family_members) VALUES (?, ?, ?, ?)",
+                (timestamp, action_type, description, json.dumps(family_members))
+            )
+            entry_id = cursor.lastrowid
+            self._conn.execute("INSERT INTO entries_fts (rowid, description) VALUES (?, ?)", (entry_id, description))
+            self._conn.executemany(
+                "INSERT INTO entry_members (entry_id, member, timestamp) VALUES (?, ?, ?)",
+                [(entry_id, self._normalize_member(m), timestamp) for m in family_members]
+            )
+        return {
+            "id": entry_id,
+            "timestamp": timestamp,
+            "action_type": action_type,
+            "family_members": family_members,
+            "description": description
+        }
+
+    def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "timestamp": row["timestamp"],
+                "action_type": row["action_type"],
+                "family_members": json.loads(row["family_members"]),
+                "description": row["description"]
+            }
+            for row in rows
+        ]
+
+    def search(self, text: str, member: Optional[str] = None, action_type: Optional[str] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text search over descriptions, best matches first."""
+        # Quote each word so user input is never parsed as FTS5 query syntax
+        match = ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+        if not match:
+            return []
+        sql = ("SELECT e.* FROM entries_fts f JOIN entries e ON e.id = f.rowid "
+               "WHERE entries_fts MATCH ?")
+        params = [match]
+        if member:
+            sql += " AND e.id IN (SELECT entry_id FROM entry_members WHERE member = ?)"
+            params.append(self._normalize_member(member))
+        if action_type:
+            sql += " AND e.action_type = ?"
+            params.append(action_type)
+        sql += " ORDER BY bm25(entries_fts) LIMIT ?"
+        params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None,
+                action_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Entries with start <= timestamp < end (ISO strings), newest first."""
+        sql = "SELECT * FROM entries WHERE timestamp >= ? AND timestamp < ?"
+        params = [start or "", end or "\uffff"]
+        if action_type:
+            sql += " AND action_type = ?"
+            params.append(action_type)
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def member_timeline(self, member: str, start: Optional[str] = None, end: Optional[str] = None,
+                        action_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Entries involving a family member, newest first."""
+        sql = ("SELECT e.* FROM entry_members m JOIN entries e ON e.id = m.entry_id "
+               "WHERE m.member = ? AND m.timestamp >= ? AND m.timestamp < ?")
+        params = [self._normalize_member(member), start or "", end or "\uffff"]
+        if action_type:
+            sql += " AND e.action_type = ?"
+            params.append(action_type)
+        sql += " ORDER BY m.timestamp DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def last_interaction(self, member: str, action_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent entry involving a family member, optionally of one action type."""
+        entries = self.member_timeline(member, action_type=action_type, limit=1)
+        return entries[0] if entries else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_family_log_store: Optional[FamilyLogStore] = None
+
+def get_family_log_store() -> FamilyLogStore:
+    """Return the process-wide family log store."""
+    global _family_log_store
+    if _family_log_store is None:
+        _family_log_store = FamilyLogStore()
+    return _family_log_store
+
+if __name__ == "__main__":
+    # Example usage: when did I last spend quality time with Sister?
+    store = get_family_log_store()
+    store.add_entry("quality_time", ["Mom", "Sister"], "Board game night and sharing stories")
+    print(store.last_interaction("sister", action_type="quality_time"))
+    print(store.search("board games"))
@@ -1,8 +1,7 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field
-import json
-from datetime import datetime
-import os
+from life_management_agency.family_coach_agent.family_log_store import get_family_log_store
+from life_management_agency.context_snapshot import get_context_snapshots
 
 class FamilyRelationshipTool(BaseTool):
     """
@@ -31,36 +30,10 @@ class FamilyRelationshipTool(BaseTool):
         Records and manages family interactions and events, providing insights and recommendations
         for maintaining healthy family relationships.
         """
-        # Create a record with timestamp
-        record = {
-            "timestamp": datetime.now().isoformat(),
-            "action_type": self.action_type,
-            "family_members": self.family_members,
-            "description": self.description
-        }
-        
-        # Ensure the family_records directory exists
-        os.makedirs("family_records", exist_ok=True)
-        
-        # Save the record to a JSON file
+        # Save the record to the indexed family log
         try:
-            file_path = "family_records/family_log.json"
-            
-            # Read existing records or create new list
-            existing_records = []
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    try:
-                        existing_records = json.load(f)
-                    except json.JSONDecodeError:
-                        existing_records = []
-            
-            # Append new record
-            existing_records.append(record)
-            
-            # Write updated records
-            with open(file_path, "w") as f:
-                json.dump(existing_records, f, indent=2)
+            entry = get_family_log_store().add_entry(self.action_type, self.family_members, self.description)
+            get_context_snapshots().record_family_entry(entry)
             
             # Generate response based on action type
             responses = {
@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from ..base_agent import BaseAgent
+from ..envelope import AgentRequest, AgentResponse
 
 class HealthAgent(BaseAgent):
     def __init__(self):
@@ -22,6 +23,9 @@ class HealthAgent(BaseAgent):
             expertise=expertise
         )
 
+    def local_recommendations(self, message: str) -> List[str]:
+        return self._generate_wellness_recommendations(message)
+
     def _get_system_prompt(self) -> str:
         return """
         You are a specialized health and wellness AI agent. Your role is to provide evidence-based health advice 
@@ -49,31 +53,23 @@ class HealthAgent(BaseAgent):
         - Wellness routine development
         """
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             # Validate and preprocess request
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
+                return self._invalid_request_response()
 
-            request = await self.preprocess_request(request)
-            message = request['message']
-            context = request.get('context', {})
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
 
-            # Add health-specific context processing
-            health_context = self._extract_health_context(message)
-            context.update(health_context)
+            # Add health-specific context as a layer over the caller's context
+            request = request.with_context(self._extract_health_context(message))
 
             # Process with base implementation
-            response = await super().process_request({
-                'message': message,
-                'context': context
-            })
+            response = await super().process_request(request)
 
             # Add health-specific metadata
-            response['metadata'].update({
+            response.metadata.update({
                 'health_focus_areas': self._identify_health_areas(message),
                 'wellness_recommendations': self._generate_wellness_recommendations(message)
             })
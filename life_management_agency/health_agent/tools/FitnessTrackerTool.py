@@ -3,6 +3,7 @@ from pydantic import Field
 import json
 import os
 from datetime import datetime, timedelta
+from life_management_agency.context_snapshot import get_context_snapshots
 
 class FitnessTrackerTool(BaseTool):
     """
@@ -53,6 +54,7 @@ class FitnessTrackerTool(BaseTool):
         try:
             with open(log_file, "w") as f:
                 json.dump(data, f, indent=2)
+            get_context_snapshots().record_fitness_activity(new_activity)
             return f"Successfully recorded activity: {self.activity} for {self.duration_minutes} minutes."
         except Exception as e:
             return f"An error occurred while recording the activity: {e}"
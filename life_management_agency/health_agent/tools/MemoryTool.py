@@ -3,6 +3,7 @@ from pydantic import Field
 import json
 import os
 from datetime import datetime, timedelta
+from life_management_agency.context_snapshot import get_context_snapshots
 
 class MemoryTool(BaseTool):
     """
@@ -65,6 +66,7 @@ class MemoryTool(BaseTool):
             try:
                 with open(memory_file, "w") as f:
                     json.dump(memories, f, indent=2)
+                get_context_snapshots().record_wellness_activity(entry)
                 return f"Successfully stored activity: {self.activity_type} for {self.duration} minutes"
             except Exception as e:
                 return f"Error storing activity: {str(e)}"
@@ -1,6 +1,16 @@
 import gradio as gr
-from life_management_agency.agency import agency
+from life_management_agency import agency as agency_module
+from life_management_agency.admission import AdmissionRejected
+from life_management_agency.usage_accounting import BudgetExceeded
+import os
 import random
+import asyncio
+
+# Queue settings: how many chats run at once, and how many may wait
+CONCURRENCY_LIMIT = int(os.getenv('GRADIO_CONCURRENCY_LIMIT', '32'))
+MAX_QUEUE_SIZE = int(os.getenv('GRADIO_MAX_QUEUE_SIZE', '256'))
+
+_agency_lock = asyncio.Lock()
 
 # Sample affirmations
 DAILY_AFFIRMATIONS = [
@@ -14,12 +24,38 @@ DAILY_AFFIRMATIONS = [
 def get_daily_affirmation():
     return random.choice(DAILY_AFFIRMATIONS)
 
+async def get_agency():
+    """Return the running agency, creating it on first use when the interface runs standalone."""
+    async with _agency_lock:
+        if agency_module.agency is None:
+            agency_module.agency = await asyncio.to_thread(agency_module.LifeManagementAgency)
+    return agency_module.agency
+
 def create_chat_interface():
-    def chat_response(message, history):
-        # Process message through agency
-        response = agency.process_message(message)
-        history.append((message, f"✨ {response}"))
-        return "", history
+    async def chat_response(message, history, request: gr.Request):
+        # Show the message right away, then stream agent output as it arrives
+        history = (history or []) + [(message, "")]
+        yield "", history
+
+        agency = await get_agency()
+        user = (request.username or request.session_hash or "user") if request else "user"
+        partials = []
+        try:
+            async for event in agency.stream_message(message, user):
+                if event['type'] == 'agent_response':
+                    agent_name = event['agent'].replace('_', ' ').title()
+                    partials.append(f"**{agent_name}:** {event['message']}")
+                    history[-1] = (message, "⏳ " + "\n\n".join(partials))
+                else:
+                    history[-1] = (message, f"✨ {event['message']}")
+                yield "", history
+        except BudgetExceeded:
+            history[-1] = (message, "You've reached today's usage limit. Please come back tomorrow.")
+            yield "", history
+        except AdmissionRejected as e:
+            # Same rate limits and fair-share queue as the API
+            history[-1] = (message, f"I'm handling a lot of requests right now. Please try again in {e.retry_after} seconds.")
+            yield "", history
 
     with gr.Blocks(
         theme=gr.themes.Soft().set(
@@ -187,6 +223,9 @@ def create_chat_interface():
         # Clear chat history
         clear = gr.Button("Clear Chat")
         clear.click(lambda: None, None, chatbot, queue=False)
+
+    # Async handlers share the event loop, so many chats can stream at once
+    interface.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=MAX_QUEUE_SIZE)
         
     return interface
 
@@ -1,7 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Union
+import time
+import asyncio
 from ..base_agent import BaseAgent
+from ..envelope import AgentRequest, AgentResponse
+from .knowledge_index import get_knowledge_index
+from .tools.TavilySearchTool import get_search_client, search_available
 
 class KnowledgeAgent(BaseAgent):
+    # Fraction of the question's terms the best local passage must contain
+    # for the web search to be skipped
+    LOCAL_RETRIEVAL_MIN_COVERAGE = 0.6
+    LOCAL_RETRIEVAL_TOP_K = 5
+
     def __init__(self):
         expertise = [
             "Information research and analysis",
@@ -22,6 +32,16 @@ class KnowledgeAgent(BaseAgent):
             expertise=expertise
         )
 
+    def local_recommendations(self, message: str) -> List[str]:
+        passages, _ = self._retrieve_local(message)
+        return [f"From {p['title']}: {p['content'][:200]}" for p in passages[:2]] + \
+            self._generate_learning_recommendations(message)
+
+    async def express_context(self, message: str) -> Dict[str, Any]:
+        # Express answers skip process_request, so ground them in the local index here
+        passages, _ = await asyncio.to_thread(self._retrieve_local, message)
+        return {'retrieved_passages': passages} if passages else {}
+
     def _get_system_prompt(self) -> str:
         return """
         You are a specialized knowledge and learning AI agent. Your role is to help users acquire, 
@@ -49,34 +69,37 @@ class KnowledgeAgent(BaseAgent):
         - Interdisciplinary connections
         """
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             # Validate and preprocess request
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
+                return self._invalid_request_response()
 
-            request = await self.preprocess_request(request)
-            message = request['message']
-            context = request.get('context', {})
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
 
             # Add knowledge-specific context processing
             knowledge_context = self._extract_knowledge_context(message)
-            context.update(knowledge_context)
 
-            # Process with base implementation
-            response = await super().process_request({
-                'message': message,
-                'context': context
-            })
+            # Ground the answer in locally indexed passages, going to the web
+            # only for research questions the index cannot answer
+            passages, search_metadata = await asyncio.to_thread(self._retrieve_local, message)
+            if passages:
+                knowledge_context['retrieved_passages'] = passages
+            elif knowledge_context['knowledge_context']['research_needed'] and search_available():
+                web_results, search_metadata = await self._search_web(message)
+                if web_results:
+                    knowledge_context['web_results'] = web_results
+
+            # Process with base implementation, layering our context over the caller's
+            response = await super().process_request(request.with_context(knowledge_context))
 
             # Add knowledge-specific metadata
-            response['metadata'].update({
+            response.metadata.update({
                 'knowledge_areas': self._identify_knowledge_areas(message),
                 'learning_recommendations': self._generate_learning_recommendations(message),
-                'research_topics': self._extract_research_topics(message)
+                'research_topics': self._extract_research_topics(message),
+                **search_metadata
             })
 
             return response
@@ -84,6 +107,45 @@ class KnowledgeAgent(BaseAgent):
         except Exception as e:
             return await self.handle_error(e)
 
+    def _retrieve_local(self, message: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Look the message up in the local knowledge index, returning passages
+        only on a confident match. Blocks on the index lock while a flush is
+        writing, so call it off the event loop.
+        """
+        started = time.perf_counter()
+        results = get_knowledge_index().search(message, k=self.LOCAL_RETRIEVAL_TOP_K)
+        latency_ms = (time.perf_counter() - started) * 1000
+        if not results or results[0]['coverage'] < self.LOCAL_RETRIEVAL_MIN_COVERAGE:
+            return [], {'local_retrieval_ms': round(latency_ms, 2)}
+
+        passages = [
+            {'title': r['title'], 'url': r['url'], 'content': r['text']}
+            for r in results
+        ]
+        return passages, {'local_retrieval_ms': round(latency_ms, 2), 'retrieval_source': 'local_index'}
+
+    async def _search_web(self, message: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Search the web for the message, returning compact results and timing metadata."""
+        started = time.perf_counter()
+        try:
+            results = await get_search_client().search(message)
+            # Index the results so similar questions can be answered locally
+            await asyncio.to_thread(get_knowledge_index().add_search_results, results)
+        except Exception as e:
+            return [], {'search_error': str(e)}
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        web_results = [
+            {
+                'title': result.get('title', ''),
+                'url': result.get('url', ''),
+                'content': result.get('content', '')[:500]
+            }
+            for result in results.get('results', [])[:5]
+        ]
+        return web_results, {'search_latency_ms': round(latency_ms, 2), 'retrieval_source': 'web_search'}
+
     def _extract_knowledge_context(self, message: str) -> Dict[str, Any]:
         """Extract knowledge-related context from the message."""
         context = {
@@ -0,0 +1,281 @@
+"""
+Local BM25 retrieval index for the KnowledgeAgent.
+
+Documents are split into passages and stored in immutable on-disk segments.
+Each segment holds a term lexicon (JSON), a postings file of (passage id,
+term frequency) uint32 pairs that is memory-mapped on load, and the passage
+lengths. New passages collect in an in-memory segment that is searched
+directly and written out on flush.
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import heapq
+import hashlib
+import threading
+from array import array
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "knowledge_index")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'how', 'i', 'in', 'is',
+    'it', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'this', 'to', 'was', 'what', 'when',
+    'which', 'who', 'why', 'will', 'with', 'you', 'your', 'can', 'do', 'does', 'about'
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+def split_passages(text: str, max_words: int = 120) -> List[str]:
+    """Split a document into passages of roughly max_words words on paragraph boundaries."""
+    passages, current = [], []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        while words:
+            room = max_words - len(current)
+            current.extend(words[:room])
+            words = words[room:]
+            if len(current) >= max_words:
+                passages.append(' '.join(current))
+                current = []
+    if current:
+        passages.append(' '.join(current))
+    return passages
+
+class _Segment:
+    """An immutable on-disk segment with memory-mapped postings."""
+
+    def __init__(self, path: str):
+        with open(path + ".lex.json", "r") as f:
+            meta = json.load(f)
+        self.base_id = meta['base_id']
+        self.lexicon = meta['terms']  # term -> [offset, document frequency]
+        self._file = open(path + ".post", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mmap) if self._mmap else memoryview(array('I'))
+        self.postings = self._view.cast('I') if self._mmap else self._view
+
+    def iter_postings(self, term: str):
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return
+        offset, df = entry
+        for i in range(offset, offset + 2 * df, 2):
+            yield self.base_id + self.postings[i], self.postings[i + 1]
+
+    def document_frequency(self, term: str) -> int:
+        entry = self.lexicon.get(term)
+        return entry[1] if entry else 0
+
+    def close(self):
+        self.postings.release()
+        self._view.release()
+        if self._mmap:
+            self._mmap.close()
+        self._file.close()
+
+class KnowledgeIndex:
+    """
+    On-disk inverted index with BM25 scoring over ingested documents and
+    previously fetched web search results.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, flush_threshold: int = 500):
+        self.index_dir = index_dir
+        self.flush_threshold = flush_threshold
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._passages: List[Dict[str, Any]] = []
+        self._lengths = array('I')
+        self._fingerprints = set()
+        self._pending: Dict[str, List[List[int]]] = defaultdict(list)
+        self._pending_base = 0
+        self._total_length = 0
+        self._load()
+
+    # Loading and persistence
+
+    def _load(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        passages_path = os.path.join(self.index_dir, "passages.jsonl")
+        if os.path.exists(passages_path):
+            with open(passages_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        passage = json.loads(line)
+                        self._passages.append(passage)
+                        self._fingerprints.add(passage['fingerprint'])
+        lengths_path = os.path.join(self.index_dir, "lengths.u32")
+        if os.path.exists(lengths_path):
+            with open(lengths_path, "rb") as f:
+                self._lengths.frombytes(f.read())
+        # Passages written after the last flush have no postings; index them again
+        flushed = len(self._lengths)
+        for name in sorted(os.listdir(self.index_dir)):
+            if name.endswith(".lex.json"):
+                self._segments.append(_Segment(os.path.join(self.index_dir, name[:-len(".lex.json")])))
+        self._total_length = sum(self._lengths)
+        self._pending_base = flushed
+        for passage in self._passages[flushed:]:
+            self._index_pending(len(self._lengths), passage['text'])
+
+    def flush(self) -> None:
+        """Write in-memory passages to a new on-disk segment."""
+        with self._lock:
+            if len(self._lengths) == self._pending_base:
+                return
+            name = os.path.join(self.index_dir, f"segment_{len(self._segments):06d}")
+            postings = array('I')
+            terms = {}
+            for term in sorted(self._pending):
+                entries = self._pending[term]
+                terms[term] = [len(postings), len(entries)]
+                for doc_id, tf in entries:
+                    postings.append(doc_id - self._pending_base)
+                    postings.append(tf)
+            with open(name + ".post", "wb") as f:
+                postings.tofile(f)
+            with open(name + ".lex.json", "w") as f:
+                json.dump({'base_id': self._pending_base, 'terms': terms}, f)
+            with open(os.path.join(self.index_dir, "lengths.u32"), "ab") as f:
+                self._lengths[self._pending_base:].tofile(f)
+            self._segments.append(_Segment(name))
+            self._pending = defaultdict(list)
+            self._pending_base = len(self._lengths)
+
+    def close(self) -> None:
+        """Flush pending passages and release memory maps."""
+        with self._lock:
+            self.flush()
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    # Ingestion
+
+    def _index_pending(self, doc_id: int, text: str) -> None:
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._pending[term].append([doc_id, tf])
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+
+    def add_document(self, text: str, title: str = "", url: str = "", source: str = "document") -> int:
+        """Split a document into passages and add the new ones. Returns the number added."""
+        added = 0
+        with self._lock:
+            with open(os.path.join(self.index_dir, "passages.jsonl"), "a") as f:
+                for passage_text in split_passages(text):
+                    fingerprint = hashlib.sha1(f"{url}\n{passage_text}".encode()).hexdigest()
+                    if fingerprint in self._fingerprints:
+                        continue
+                    passage = {
+                        'title': title,
+                        'url': url,
+                        'source': source,
+                        'text': passage_text,
+                        'fingerprint': fingerprint
+                    }
+                    f.write(json.dumps(passage) + "\n")
+                    self._index_pending(len(self._passages), passage_text)
+                    self._passages.append(passage)
+                    self._fingerprints.add(fingerprint)
+                    added += 1
+            if len(self._lengths) - self._pending_base >= self.flush_threshold:
+                self.flush()
+        return added
+
+    def add_search_results(self, response: Dict[str, Any]) -> int:
+        """Add the results of a Tavily search response. Returns the number of passages added."""
+        added = 0
+        for result in response.get('results', []):
+            content = result.get('raw_content') or result.get('content') or ''
+            if content:
+                added += self.add_document(content, title=result.get('title', ''),
+                                           url=result.get('url', ''), source='web_search')
+        return added
+
+    # Search
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def _postings(self, term: str) -> Iterable:
+        for segment in self._segments:
+            yield from segment.iter_postings(term)
+        yield from self._pending.get(term, ())
+
+    def _document_frequency(self, term: str) -> int:
+        return sum(s.document_frequency(term) for s in self._segments) + len(self._pending.get(term, ()))
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the top-k passages for the query, best first. Each result carries
+        its BM25 score and coverage, the fraction of query terms it contains.
+        """
+        with self._lock:
+            n = len(self._lengths)
+            query_terms = set(tokenize(query))
+            if not n or not query_terms:
+                return []
+            avg_length = self._total_length / n or 1.0
+            scores: Dict[int, float] = defaultdict(float)
+            matched: Dict[int, int] = defaultdict(int)
+            for term in query_terms:
+                df = self._document_frequency(term)
+                if not df:
+                    continue
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for doc_id, tf in self._postings(term):
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[doc_id] += 1
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                {**{key: self._passages[doc_id][key] for key in ('title', 'url', 'source', 'text')},
+                 'score': round(score, 4),
+                 'coverage': round(matched[doc_id] / len(query_terms), 4)}
+                for doc_id, score in top
+            ]
+
+_knowledge_index: Optional[KnowledgeIndex] = None
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Return the process-wide knowledge index, loading it on first use."""
+    global _knowledge_index
+    if _knowledge_index is None:
+        _knowledge_index = KnowledgeIndex()
+    return _knowledge_index
+
+if __name__ == "__main__":
+    # Example usage: index a few documents and time a search
+    import tempfile
+    import time
+
+    index = KnowledgeIndex(tempfile.mkdtemp())
+    index.add_document("Spaced repetition schedules reviews at increasing intervals to improve long-term retention.",
+                       title="Spaced repetition")
+    index.add_document("Deep sleep supports memory consolidation and learning.", title="Sleep and memory")
+    index.flush()
+    index.add_document("Active recall means testing yourself instead of re-reading notes.", title="Active recall")
+
+    started = time.perf_counter()
+    results = index.search("how does sleep help memory")
+    print(f"Search took {(time.perf_counter() - started) * 1000:.3f} ms")
+    for result in results:
+        print(result['score'], result['title'])
+    index.close()
@@ -1,14 +1,193 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field
 import os
+import json
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
-from tavily import TavilyClient
+
+from life_management_agency import metrics
+from life_management_agency.deadline import DeadlineExceeded, remaining
+from life_management_agency.recording import get_cassette
+from life_management_agency.knowledge_agent.knowledge_index import get_knowledge_index
 
 load_dotenv()  # Load environment variables
 
 # Access the Tavily API key from environment variables
 tavily_api_key = os.getenv("TAVILY_API_KEY")
 
+# Base URL of the Tavily API; point it at a local stand-in for offline testing
+tavily_api_url = os.getenv("TAVILY_API_URL", "https://api.tavily.com")
+
+def search_available() -> bool:
+    """Whether web search can be used: with an API key, or offline from a replayed cassette."""
+    cassette = get_cassette()
+    return bool(tavily_api_key) or (cassette is not None and cassette.mode == 'replay')
+
+class _SharedSearch:
+    """One upstream search and the number of callers waiting for it."""
+
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class TavilySearchClient:
+    """
+    Reusable async client for the Tavily Search API.
+    Keeps a pool of HTTP connections, caches results by normalized query with a TTL
+    and a size bound, and shares one upstream request between identical concurrent searches.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 cache_ttl: float = 3600, cache_size: int = 1024,
+                 max_connections: int = 20, timeout: float = 30.0):
+        self.api_key = api_key or tavily_api_key
+        self.base_url = (base_url or tavily_api_url).rstrip('/')
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, _SharedSearch] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize case and whitespace so trivially different queries share a cache entry."""
+        return ' '.join(query.lower().split())
+
+    def _cache_key(self, query: str, params: Dict[str, Any]) -> str:
+        return json.dumps([self.normalize_query(query), params], sort_keys=True)
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, creating it for the running event loop if needed."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+            self._http_loop = loop
+        return self._http
+
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        self._cache[key] = (time.monotonic(), result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def search(self, query: str, **params) -> Dict[str, Any]:
+        """Search for a query, serving repeated and concurrent identical queries without extra requests."""
+        key = self._cache_key(query, params)
+        cached = self._get_cached(key)
+        if cached is not None:
+            metrics.increment('tavily.cache_hits')
+            return cached
+
+        # Each caller waits no longer than its own request deadline
+        budget = remaining()
+        if budget is not None and budget <= 0:
+            metrics.increment('deadline.search_skipped')
+            raise DeadlineExceeded("Request deadline passed before the web search")
+
+        shared = self._in_flight.get(key)
+        if shared is None:
+            metrics.increment('tavily.cache_misses')
+            # The fetch is owned by the client, not by the caller that started it:
+            # it runs in a fresh context, so neither that caller's cancellation nor
+            # its deadline applies to the others sharing it
+            shared = _SharedSearch(asyncio.create_task(self._fetch_and_store(key, query, params),
+                                                       context=contextvars.Context()))
+            self._in_flight[key] = shared
+        else:
+            metrics.increment('tavily.deduplicated')
+
+        shared.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(shared.task), budget)
+        except asyncio.TimeoutError:
+            if shared.task.done():
+                # The fetch itself timed out; not our deadline
+                raise
+            metrics.increment('deadline.search_cut')
+            raise DeadlineExceeded(f"Web search cut short by the request deadline after {budget:.1f}s") from None
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.task.done():
+                # Every caller went away; stop the search and let the next one start afresh
+                shared.task.cancel()
+                if self._in_flight.get(key) is shared:
+                    del self._in_flight[key]
+
+    async def _fetch_and_store(self, key: str, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = await self._fetch(query, params)
+            self._store(key, result)
+            return result
+        finally:
+            shared = self._in_flight.get(key)
+            if shared is not None and shared.task is asyncio.current_task():
+                del self._in_flight[key]
+
+    async def search_many(self, queries: List[str], **params) -> List[Any]:
+        """Run several searches concurrently; failed searches are returned as exceptions."""
+        return await asyncio.gather(*(self.search(q, **params) for q in queries), return_exceptions=True)
+
+    async def _fetch(self, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        cassette = get_cassette()
+        if cassette is not None:
+            return await cassette.call('search', {'query': query, **params}, lambda: self._post(query, params))
+        return await self._post(query, params)
+
+    async def _post(self, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.api_key:
+            raise ValueError("Tavily API key not found. Please set the TAVILY_API_KEY environment variable.")
+        started = time.perf_counter()
+        response = await self._get_http_client().post(
+            "/search",
+            json={"api_key": self.api_key, "query": query, **params},
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        response.raise_for_status()
+        metrics.increment('tavily.request_seconds', time.perf_counter() - started)
+        return response.json()
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._http_loop = None
+
+_search_client: Optional[TavilySearchClient] = None
+
+def get_search_client() -> TavilySearchClient:
+    """Return the process-wide search client."""
+    global _search_client
+    if _search_client is None:
+        _search_client = TavilySearchClient()
+    return _search_client
+
 class TavilySearchTool(BaseTool):
     """
     A tool that allows agents to perform web searches using the Tavily Search API.
@@ -18,26 +197,42 @@ class TavilySearchTool(BaseTool):
         ..., description="The search query to retrieve information from the web."
     )
 
-    def run(self):
+    async def run(self):
         """
         Executes the search query using the Tavily Search API and returns the results.
         """
         # Check if the Tavily API key is available
-        if not tavily_api_key:
+        if not search_available():
             return "Error: Tavily API key not found. Please set the TAVILY_API_KEY environment variable."
 
-        # Initialize the Tavily client
-        tavily_client = TavilyClient(api_key=tavily_api_key)
-
-        # Perform the search
+        # Perform the search through the shared client
         try:
-            response = tavily_client.search(self.query)
-            # Process and return the search results
+            response = await get_search_client().search(self.query)
+            # Keep the results for local retrieval next time
+            await asyncio.to_thread(get_knowledge_index().add_search_results, response)
             return response
         except Exception as e:
             return f"An error occurred while performing the search: {e}"
 
 if __name__ == "__main__":
-    # Example usage
-    tool = TavilySearchTool(query="Latest advancements in AI technology")
-    print(tool.run()) 
\ No newline at end of file
+    # Example usage: compare a cold search, a cached repeat and concurrent duplicates
+    async def main():
+        client = get_search_client()
+        query = "Latest advancements in AI technology"
+
+        started = time.perf_counter()
+        await client.search(query)
+        print(f"Cold search: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        started = time.perf_counter()
+        await client.search(f"  {query.upper()} ")
+        print(f"Cached search: {(time.perf_counter() - started) * 1000:.3f} ms")
+
+        client._cache.clear()
+        started = time.perf_counter()
+        await client.search_many([query] * 5)
+        print(f"5 concurrent identical searches: {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(metrics.snapshot())
+        await client.aclose()
+
+    asyncio.run(main())
@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from ..base_agent import BaseAgent
+from ..envelope import AgentRequest, AgentResponse
 
 class LifestyleAgent(BaseAgent):
     def __init__(self):
@@ -22,6 +23,12 @@ class LifestyleAgent(BaseAgent):
             expertise=expertise
         )
 
+    def local_recommendations(self, message: str) -> List[str]:
+        return [
+            f"{o['activity']} ({o['time']}, {o['duration']}): {o['benefit']}"
+            for o in self._suggest_routine_optimizations(message)
+        ] or self._generate_habit_recommendations(message)
+
     def _get_system_prompt(self) -> str:
         return """
         You are a specialized lifestyle and habit management AI agent. Your role is to help users 
@@ -51,31 +58,23 @@ class LifestyleAgent(BaseAgent):
         - Lifestyle design
         """
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             # Validate and preprocess request
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
+                return self._invalid_request_response()
 
-            request = await self.preprocess_request(request)
-            message = request['message']
-            context = request.get('context', {})
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
 
-            # Add lifestyle-specific context processing
-            lifestyle_context = self._extract_lifestyle_context(message)
-            context.update(lifestyle_context)
+            # Add lifestyle-specific context as a layer over the caller's context
+            request = request.with_context(self._extract_lifestyle_context(message))
 
             # Process with base implementation
-            response = await super().process_request({
-                'message': message,
-                'context': context
-            })
+            response = await super().process_request(request)
 
             # Add lifestyle-specific metadata
-            response['metadata'].update({
+            response.metadata.update({
                 'lifestyle_areas': self._identify_lifestyle_areas(message),
                 'habit_recommendations': self._generate_habit_recommendations(message),
                 'routine_optimizations': self._suggest_routine_optimizations(message)
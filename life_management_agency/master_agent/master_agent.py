@@ -1,9 +1,51 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Optional, Tuple, Callable, Awaitable, Union
 import json
+import os
+import time
 import asyncio
+import contextvars
 from life_management_agency.base_agent import BaseAgent
+from life_management_agency.envelope import AgentRequest, AgentResponse, Context, ResponseMetadata
+from life_management_agency.conversation_memory import ConversationMemory, summary_prompt
+from life_management_agency.user_memory import get_user_memory
+from life_management_agency.context_snapshot import get_context_snapshots
+from life_management_agency.degraded_mode import get_degraded_mode
+from life_management_agency.deadline import DeadlineExceeded, deadline_scope, remaining
+from life_management_agency.tools.ResponseSynthesisTool import ResponseSynthesisTool
+from life_management_agency.tools.AgentCoordinationTool import AgentCoordinationTool
+from life_management_agency import metrics
 
 class MasterAgent(BaseAgent):
+    # Minimum word overlap between every pair of agent answers for them to be
+    # merged locally instead of through an LLM synthesis call
+    LOCAL_MERGE_OVERLAP = 0.6
+
+    # In 'auto' mode, messages touching at most this many domains (and no
+    # longer than EXPRESS_MAX_WORDS) are answered with a single LLM call
+    EXPRESS_MAX_DOMAINS = 2
+    EXPRESS_MAX_WORDS = 60
+
+    # Long-term facts about the user attached to each request
+    USER_FACTS_TOP_K = 5
+
+    # Share of the time left that routing may use before the keyword
+    # prediction is used instead, and the time kept back for synthesis
+    # while collecting agent answers
+    ROUTING_BUDGET_FRACTION = 0.3
+    SYNTHESIS_RESERVE_SECONDS = 5.0
+    # Below this much time left, answers are merged locally instead of by the LLM
+    SYNTHESIS_MIN_SECONDS = 2.0
+
+    # Section headings of the degraded-mode answer, by domain
+    DEGRADED_SECTION_TITLES = {
+        'knowledge': 'Learning',
+        'health': 'Health and wellness',
+        'lifestyle': 'Daily routine',
+        'social': 'Social media',
+        'personal': 'Personal growth',
+        'family': 'Family time'
+    }
+
     def __init__(self):
         expertise = [
             "Message routing and coordination",
@@ -23,86 +65,361 @@ class MasterAgent(BaseAgent):
             description="Master agent that coordinates all other agents and manages conversation flow",
             expertise=expertise
         )
+        # Pipeline mode used when a request does not pick one: 'full', 'express' or 'auto'
+        self.default_mode = os.getenv('MASTER_AGENT_MODE', 'auto')
+        # Per-user rolling memory: recent turns verbatim, older turns summarized
+        self.conversation_memory = ConversationMemory(
+            self._summarize_conversation,
+            recent_turns=int(os.getenv('MEMORY_RECENT_TURNS', '6')),
+            summarize_batch=int(os.getenv('MEMORY_SUMMARIZE_BATCH', '4'))
+        )
+        self._background_tasks = set()
+
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]],
+                              on_agent_response: Optional[Callable[[str, AgentResponse], Awaitable[None]]] = None) -> AgentResponse:
+        """Route the request to the relevant agents and synthesize their answers.
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        If ``on_agent_response`` is given it is awaited with the agent name and
+        response as soon as each agent finishes, before synthesis starts.
+        """
         try:
-            message = request.get('message', '')
-            user = request.get('user', 'user')
-            context = request.get('context', {})
-
-            # Analyze message to determine which agents should be involved
-            analysis = await self._analyze_message(message)
-            involved_agents = analysis.get('involved_agents', ['master_agent'])
-            
-            # Initialize thought process tracking
-            thought_process = [
-                f"Analyzing message: {message}",
-                f"Identified relevant agents: {', '.join(involved_agents)}"
-            ]
+            request = AgentRequest.coerce(request)
+            # LLM calls and tools started from here on see the request's deadline
+            with deadline_scope(request.deadline):
+                message = request.message
+                # Every agent sees the conversation so far and the most relevant
+                # facts remembered about the user through the shared context
+                memory_context = self.conversation_memory.context_for(request.user)
+                user_facts = await asyncio.to_thread(get_user_memory().recall, request.user, message, self.USER_FACTS_TOP_K)
+                if user_facts:
+                    memory_context['user_facts'] = [fact['text'] for fact in user_facts]
+                # The user's own fitness, wellness and family data, served from memory
+                user_snapshot = get_context_snapshots().snapshot(request.user)
+                if user_snapshot:
+                    memory_context['user_snapshot'] = user_snapshot
+                request = request.with_context(memory_context)
+                relevance_scores = AgentCoordinationTool(message=message)._analyze_domain_relevance(message)
+
+                # While the LLM is slow or failing, answer from local tables and probe it in the background
+                degraded_mode = get_degraded_mode()
+                if degraded_mode.active:
+                    degraded_mode.maybe_probe(self._probe_llm)
+                    return self._remember(request, await self._process_degraded(message, request.context, relevance_scores, degraded_mode.reason))
 
-            # Collect responses from relevant agents
-            agent_responses = []
-            for agent_name in involved_agents:
-                if agent_name != 'master_agent':
+                # Answer simple queries with one combined LLM call
+                mode = request.mode or self.default_mode
+                if mode == 'express' or (mode == 'auto' and self._is_simple_query(message, relevance_scores)):
                     try:
-                        if hasattr(self.agency, agent_name):
-                            agent = getattr(self.agency, agent_name)
-                            response = await agent.process_request({
-                                'message': message,
-                                'user': user,
-                                'context': {
-                                    **context,
-                                    'analysis': analysis.get('context', {}),
-                                    'other_agents': [a for a in involved_agents if a != agent_name]
-                                }
-                            })
-                            agent_responses.append(response)
-                            thought_process.append(f"Received response from {agent_name}")
+                        response = await self._process_express(message, request.context, relevance_scores)
+                    except Exception as e:
+                        print(f"Express call failed, answering in degraded mode: {str(e)}")
+                        reason = 'deadline' if isinstance(e, DeadlineExceeded) else 'llm_error'
+                        response = await self._process_degraded(message, request.context, relevance_scores, reason)
+                    return self._remember(request, response)
+
+                # Speculatively start the agents predicted by the local keyword
+                # scores while the LLM router decides which agents to involve
+                predicted = (await AgentCoordinationTool(message=message).run())['required_agents']
+                speculative = {
+                    agent_name: self._start_agent(agent_name, request, {}, predicted)
+                    for agent_name in predicted
+                    if agent_name != 'master_agent' and hasattr(self.agency, agent_name)
+                }
+                analysis_task = asyncio.create_task(self._analyze_message(message))
+                tasks = {}
+                deadline_cut = []
+                try:
+                    # Analyze message to determine which agents should be involved,
+                    # falling back to the keyword prediction if routing is too slow
+                    try:
+                        analysis = await asyncio.wait_for(analysis_task, self._stage_budget(fraction=self.ROUTING_BUDGET_FRACTION))
+                    except asyncio.TimeoutError:
+                        analysis = {'involved_agents': predicted, 'context': {}, 'priority': predicted}
+                        deadline_cut.append('routing')
+                    involved_agents = analysis.get('involved_agents', ['master_agent'])
+
+                    # Initialize thought process tracking
+                    thought_process = [
+                        f"Analyzing message: {message}",
+                        f"Speculatively started agents: {', '.join(speculative) or 'none'}",
+                        f"Identified relevant agents: {', '.join(involved_agents)}"
+                    ]
+                    if deadline_cut:
+                        thought_process.append("Routing cut short by the deadline; using predicted agents")
+
+                    # Keep confirmed speculative runs and drop the rest
+                    for agent_name, task in speculative.items():
+                        if agent_name in involved_agents:
+                            tasks[agent_name] = task
+                            metrics.increment('speculation.hits')
                         else:
+                            self._discard_speculative(task)
+                            thought_process.append(f"Discarded speculative run of {agent_name}")
+                    metrics.increment('speculation.predicted', len(speculative))
+
+                    # Start agents the router added that were not predicted
+                    for agent_name in involved_agents:
+                        if agent_name == 'master_agent' or agent_name in tasks:
+                            continue
+                        if not hasattr(self.agency, agent_name):
                             thought_process.append(f"Agent {agent_name} not found in agency")
-                    except Exception as e:
-                        thought_process.append(f"Error getting response from {agent_name}: {str(e)}")
+                            continue
+                        tasks[agent_name] = self._start_agent(
+                            agent_name, request, analysis.get('context', {}), involved_agents
+                        )
+                        metrics.increment('speculation.late_starts')
 
-            # Synthesize final response
-            final_response = await self._synthesize_responses(agent_responses, analysis)
-            thought_process.append("Synthesized final response")
+                    # Collect responses from relevant agents as each completes, until
+                    # only the time reserved for synthesis is left
+                    agent_responses = {}
+                    try:
+                        for next_done in asyncio.as_completed(tasks.values(), timeout=self._stage_budget(reserve=self.SYNTHESIS_RESERVE_SECONDS)):
+                            agent_name, response, error = await next_done
+                            if error is not None:
+                                thought_process.append(f"Error getting response from {agent_name}: {str(error)}")
+                                continue
+                            agent_responses[agent_name] = response
+                            thought_process.append(f"Received response from {agent_name}")
+                            if on_agent_response is not None:
+                                await on_agent_response(agent_name, response)
+                    except asyncio.TimeoutError:
+                        late = [name for name, task in tasks.items() if name not in agent_responses and not task.done()]
+                        deadline_cut.append('agents')
+                        metrics.increment('deadline.agents_cut', len(late))
+                        thought_process.append(f"Deadline reached; continuing without {', '.join(late) or 'no agents'}")
+                finally:
+                    # Abort work still running if we were cancelled or failed
+                    analysis_task.cancel()
+                    for task in [*speculative.values(), *tasks.values()]:
+                        task.cancel()
 
-            return {
-                'message': final_response,
-                'metadata': {
+                # Synthesize final response, keeping the routing order
+                ordered_responses = [agent_responses[name] for name in involved_agents if name in agent_responses]
+                if all(response.failed for response in ordered_responses) and \
+                        (ordered_responses or deadline_cut or analysis.get('context', {}).get('error')):
+                    # Routing or every agent failed or ran out of time: a local answer beats an error message
+                    reason = 'deadline' if deadline_cut else 'llm_error'
+                    return self._remember(request, await self._process_degraded(message, request.context, relevance_scores, reason))
+                final_response, synthesis_path = await self._synthesize_responses(ordered_responses, analysis)
+                thought_process.append(f"Synthesized final response ({synthesis_path})")
+                if synthesis_path == 'deadline_merge':
+                    deadline_cut.append('synthesis')
+                if deadline_cut:
+                    metrics.increment('deadline.requests_cut')
+
+                return self._remember(request, AgentResponse(final_response, ResponseMetadata(details={
                     'involved_agents': involved_agents,
-                    'thought_process': thought_process
-                }
-            }
+                    'thought_process': thought_process,
+                    'synthesis': synthesis_path,
+                    'mode': 'full',
+                    'deadline_cut': deadline_cut
+                })))
 
         except Exception as e:
             return await self.handle_error(e)
 
+    def _remember(self, request: AgentRequest, response: AgentResponse) -> AgentResponse:
+        """Record a completed exchange in conversation memory and learn facts from it in the background."""
+        self.conversation_memory.record_turn(request.user, request.message, response.message or '')
+        task = asyncio.create_task(
+            asyncio.to_thread(get_user_memory().remember_from_message, request.user, request.message),
+            context=contextvars.Context()  # Detached from the request's deadline and usage scope
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return response
+
+    async def _summarize_conversation(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold turns into the running summary; runs in the background, off the request path."""
+        response = await self._create_completion(summary_prompt(summary, turns), max_tokens=400)
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _stage_budget(fraction: float = 1.0, reserve: float = 0.0) -> Optional[float]:
+        """
+        Seconds a stage may take: a fraction of the time left before the
+        request deadline, minus time reserved for later stages (never more
+        than a quarter of what is left). None when there is no deadline.
+        """
+        left = remaining()
+        if left is None:
+            return None
+        return max(0.0, left * fraction - min(reserve, left / 4))
+
+    async def _probe_llm(self) -> None:
+        """Smallest possible LLM call, used to detect recovery while in degraded mode."""
+        await self._create_completion([{"role": "user", "content": "ping"}], max_tokens=1)
+
+    async def _process_degraded(self, message: str, context: Mapping[str, Any],
+                          relevance_scores: Dict[str, float], reason: Optional[str]) -> AgentResponse:
+        """Answer from the agents' local recommendation tables without calling the LLM."""
+        started = time.perf_counter()
+        coordinator = AgentCoordinationTool(message=message)
+        ranked_domains = sorted(
+            (domain for domain, score in relevance_scores.items() if score > 0),
+            key=lambda domain: relevance_scores[domain],
+            reverse=True
+        )
+
+        agents = {}
+        for domain in ranked_domains:
+            agent_name = coordinator._map_domain_to_agent(domain)
+            agent = getattr(self.agency, agent_name, None)
+            if agent is not None:
+                agents[domain] = (agent_name, agent)
+        # Some tables live on disk (the knowledge index), so look them up off the event loop
+        all_recommendations = await asyncio.gather(*(
+            asyncio.to_thread(agent.local_recommendations, message) for _, agent in agents.values()
+        ))
+
+        sections = []
+        involved_agents = ['master_agent']
+        for (domain, (agent_name, _)), recommendations in zip(agents.items(), all_recommendations):
+            if recommendations:
+                involved_agents.append(agent_name)
+                sections.append(f"{self.DEGRADED_SECTION_TITLES.get(domain, domain.title())}:\n" +
+                                "\n".join(f"- {r}" for r in recommendations))
+
+        parts = ["I can't reach my full assistant right now, so here are some quick suggestions from my offline guides."]
+        if sections:
+            parts.extend(sections)
+        else:
+            parts.append("I couldn't match your message to any of them.")
+        user_snapshot = context.get('user_snapshot')
+        if user_snapshot:
+            parts.append(f"Here's what I have on record for you:\n{user_snapshot}")
+        parts.append("Ask me again in a little while for a more personal answer.")
+
+        metrics.increment('degraded.responses')
+        message_text, synthesis_path = self._record_synthesis_path('degraded', "\n\n".join(parts))
+        return AgentResponse(message_text, ResponseMetadata(details={
+            'involved_agents': involved_agents,
+            'thought_process': [
+                f"Analyzing message: {message}",
+                f"Degraded mode ({reason}): answered from local tables of {', '.join(involved_agents[1:]) or 'no agents'} "
+                f"in {(time.perf_counter() - started) * 1000:.2f} ms"
+            ],
+            'synthesis': synthesis_path,
+            'mode': 'degraded',
+            'degraded': True,
+            'degraded_reason': reason
+        }))
+
+    def _is_simple_query(self, message: str, relevance_scores: Dict[str, float]) -> bool:
+        """Whether a message is narrow and short enough for the express pipeline."""
+        domains = [domain for domain, score in relevance_scores.items() if score > 0]
+        return len(domains) <= self.EXPRESS_MAX_DOMAINS and len(message.split()) <= self.EXPRESS_MAX_WORDS
+
+    async def _process_express(self, message: str, context: Mapping[str, Any], relevance_scores: Dict[str, float]) -> AgentResponse:
+        """
+        Answer in a single round trip: one prompt carrying the system prompts and
+        expertise of every relevant agent, instead of routing, fan-out and synthesis.
+        """
+        coordinator = AgentCoordinationTool(message=message)
+        ranked_domains = sorted(
+            (domain for domain, score in relevance_scores.items() if score > 0),
+            key=lambda domain: relevance_scores[domain],
+            reverse=True
+        )
+        agent_names = [coordinator._map_domain_to_agent(domain) for domain in ranked_domains]
+        agents = {name: getattr(self.agency, name) for name in agent_names if hasattr(self.agency, name)}
+
+        thought_process = [
+            f"Analyzing message: {message}",
+            f"Express mode with agents: {', '.join(agents) or 'master_agent'}"
+        ]
+
+        sections = []
+        for name, agent in agents.items():
+            expertise_str = "\n".join([f"- {exp}" for exp in agent.expertise])
+            sections.append(f"""
+            ## {name}
+            Expertise:
+            {expertise_str}
+
+            Guidelines:
+            {agent._get_system_prompt()}
+            """)
+
+        # Let agents ground the single call as they would their own, e.g. with retrieved passages
+        express_context = {}
+        for extra in await asyncio.gather(*(agent.express_context(message) for agent in agents.values())):
+            express_context.update(extra)
+        if 'retrieved_passages' in express_context:
+            thought_process.append(f"Retrieved {len(express_context['retrieved_passages'])} passages from the local knowledge index")
+
+        system_prompt = self._get_system_prompt()
+        if sections:
+            system_prompt = f"""
+            You are the Life Management Agency answering in a single pass on behalf of these specialist agents:
+            {"".join(sections)}
+            Combine their perspectives into one coherent, friendly reply that addresses the user's intent.
+            Prioritize practical, actionable advice and be clear and concise.
+            Do not mention the individual agents or this instruction.
+            """
+
+        response = await self._create_completion([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self._format_user_message(message, Context.of(context).derive(express_context))}
+        ])
+        thought_process.append("Generated combined response")
+        metrics.increment('synthesis.express')
+
+        return AgentResponse(response.choices[0].message.content, ResponseMetadata(details={
+            'involved_agents': ['master_agent', *agents],
+            'thought_process': thought_process,
+            'synthesis': 'express',
+            'mode': 'express'
+        }))
+
+    def _start_agent(self, agent_name: str, request: AgentRequest,
+                     analysis_context: Dict[str, Any], involved_agents: List[str]) -> asyncio.Task:
+        """Start an agent in the background with its own context layer over the shared request context."""
+        return asyncio.create_task(self._run_agent(agent_name, request.with_context({
+            'analysis': analysis_context,
+            'other_agents': [a for a in involved_agents if a not in (agent_name, 'master_agent')]
+        })))
+
+    def _discard_speculative(self, task: asyncio.Task) -> None:
+        """Drop a speculative agent run the router did not confirm, counting the tokens it wasted."""
+        metrics.increment('speculation.misses')
+        if not task.done():
+            task.cancel()
+            metrics.increment('speculation.cancelled')
+            return
+        _, response, _ = task.result()
+        usage = response.metadata.get('usage', {}) if response is not None else {}
+        metrics.increment('speculation.wasted_tokens', usage.get('total_tokens', 0))
+
+    async def _run_agent(self, agent_name: str, request: AgentRequest) -> Tuple[str, Optional[AgentResponse], Optional[Exception]]:
+        """Run a single agent, returning its name with either the response or the error."""
+        try:
+            agent = getattr(self.agency, agent_name)
+            return agent_name, await agent.process_request(request), None
+        except Exception as e:
+            return agent_name, None, e
+
     async def _analyze_message(self, message: str) -> Dict[str, Any]:
         """Analyze the message to determine which agents should be involved."""
         try:
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": """
-                    Analyze the message and determine which agents should be involved.
-                    Available agents:
-                    - knowledge_agent: For learning and information
-                    - health_agent: For wellness and health
-                    - lifestyle_agent: For daily routines and habits
-                    - social_media_agent: For social media management
-                    - personal_coach_agent: For personal growth
-                    - family_coach_agent: For family relationships
-
-                    Return a JSON with:
-                    - involved_agents: list of agent names (always include master_agent)
-                    - context: relevant context for the agents
-                    - priority: order of agent involvement
-                    """},
-                    {"role": "user", "content": message}
-                ]
-            )
+            response = await self._create_completion([
+                {"role": "system", "content": """
+                Analyze the message and determine which agents should be involved.
+                Available agents:
+                - knowledge_agent: For learning and information
+                - health_agent: For wellness and health
+                - lifestyle_agent: For daily routines and habits
+                - social_media_agent: For social media management
+                - personal_coach_agent: For personal growth
+                - family_coach_agent: For family relationships
+
+                Return a JSON with:
+                - involved_agents: list of agent names (always include master_agent)
+                - context: relevant context for the agents
+                - priority: order of agent involvement
+                """},
+                {"role": "user", "content": message}
+            ])
 
             # Parse and validate response
             try:
@@ -125,59 +442,100 @@ class MasterAgent(BaseAgent):
                 'priority': ['master_agent']
             }
 
-    async def _synthesize_responses(self, responses: List[Dict[str, Any]], analysis: Dict[str, Any]) -> str:
-        """Synthesize responses from multiple agents into a coherent response."""
+    async def _synthesize_responses(self, responses: List[AgentResponse], analysis: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Synthesize responses from multiple agents into a coherent response.
+
+        Returns the message and the synthesis path that produced it, one of
+        'default' (no responses), 'direct' (single response), 'local_merge'
+        (overlapping responses merged without an LLM call), 'llm' or
+        'deadline_merge' (merged locally because the deadline was near).
+        """
         try:
             # Extract response messages and metadata
             response_data = []
+            failed_data = []
             for resp in responses:
-                if isinstance(resp, dict):
-                    message = resp.get('message', '')
-                    if not message and 'response' in resp:
-                        message = resp['response']
-                    metadata = resp.get('metadata', {})
-                    response_data.append({
-                        'message': message,
-                        'agent': metadata.get('agent', 'unknown'),
-                        'confidence': metadata.get('confidence', 0.5)
-                    })
-                else:
-                    response_data.append({
-                        'message': str(resp),
-                        'agent': 'unknown',
-                        'confidence': 0.5
-                    })
+                entry = {
+                    'message': resp.message or '',
+                    'agent': resp.metadata.get('agent', 'unknown'),
+                    'confidence': resp.metadata.get('confidence', 0.5)
+                }
+                (failed_data if resp.failed else response_data).append(entry)
+
+            # Only fall back to error replies when no agent succeeded
+            if not response_data:
+                response_data = failed_data
 
             # If no responses, provide a default response
             if not response_data:
-                return "I understand your message. However, I need more context or information to provide a helpful response. Could you please provide more details?"
+                return self._record_synthesis_path('default', "I understand your message. However, I need more context or information to provide a helpful response. Could you please provide more details?")
 
-            # Use GPT to synthesize responses
-            synthesis_prompt = f"""
-            Synthesize these agent responses into a coherent, helpful reply:
-            {json.dumps(response_data, indent=2)}
+            # A single answer needs no synthesis
+            if len(response_data) == 1:
+                return self._record_synthesis_path('direct', response_data[0]['message'])
 
-            Context from analysis:
-            {json.dumps(analysis.get('context', {}), indent=2)}
+            # Answers that largely say the same thing can be merged locally
+            if self._min_pairwise_overlap([r['message'] for r in response_data]) >= self.LOCAL_MERGE_OVERLAP:
+                merged = ResponseSynthesisTool(
+                    responses={r['agent']: r['message'] for r in response_data},
+                    deduplicate=True
+                ).run()
+                return self._record_synthesis_path('local_merge', merged)
 
-            Guidelines:
-            1. Maintain a consistent, friendly tone
-            2. Integrate insights from all agents
-            3. Prioritize practical, actionable advice
-            4. Be clear and concise
-            5. Address the user's original intent
-            """
+            # Use GPT to synthesize responses when there is time for it
+            left = remaining()
+            if left is None or left >= self.SYNTHESIS_MIN_SECONDS:
+                synthesis_prompt = f"""
+                Synthesize these agent responses into a coherent, helpful reply:
+                {json.dumps(response_data, indent=2)}
+
+                Context from analysis:
+                {json.dumps(analysis.get('context', {}), indent=2)}
 
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a response synthesizer that creates coherent, helpful responses from multiple agent inputs."},
-                    {"role": "user", "content": synthesis_prompt}
-                ]
-            )
+                Guidelines:
+                1. Maintain a consistent, friendly tone
+                2. Integrate insights from all agents
+                3. Prioritize practical, actionable advice
+                4. Be clear and concise
+                5. Address the user's original intent
+                """
 
-            return response.choices[0].message.content
+                try:
+                    response = await self._create_completion([
+                        {"role": "system", "content": "You are a response synthesizer that creates coherent, helpful responses from multiple agent inputs."},
+                        {"role": "user", "content": synthesis_prompt}
+                    ])
+                    return self._record_synthesis_path('llm', response.choices[0].message.content)
+                except DeadlineExceeded:
+                    pass
+
+            # Out of time: merge the answers we have locally
+            merged = ResponseSynthesisTool(
+                responses={r['agent']: r['message'] for r in response_data},
+                deduplicate=True
+            ).run()
+            return self._record_synthesis_path('deadline_merge', merged)
 
         except Exception as e:
-            return f"I've gathered insights from multiple perspectives but encountered an error synthesizing them: {str(e)}"
+            return self._record_synthesis_path('error', f"I've gathered insights from multiple perspectives but encountered an error synthesizing them: {str(e)}")
+
+    def _record_synthesis_path(self, path: str, message: str) -> Tuple[str, str]:
+        """Count which synthesis path was taken and return it with the message."""
+        metrics.increment(f"synthesis.{path}")
+        return message, path
+
+    @staticmethod
+    def _min_pairwise_overlap(messages: List[str]) -> float:
+        """Smallest Jaccard similarity between the word sets of any two messages."""
+        word_sets = [
+            {w for w in ''.join(c if c.isalnum() else ' ' for c in m.lower()).split() if len(w) > 2}
+            for m in messages
+        ]
+        overlap = 1.0
+        for i in range(len(word_sets)):
+            for j in range(i + 1, len(word_sets)):
+                union = word_sets[i] | word_sets[j]
+                if union:
+                    overlap = min(overlap, len(word_sets[i] & word_sets[j]) / len(union))
+        return overlap
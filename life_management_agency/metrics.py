@@ -0,0 +1,30 @@
+"""
+Process-wide counters for the agency pipeline, exposed through the /metrics endpoint.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+
+def increment(name: str, value: float = 1) -> None:
+    """Add value to the named counter."""
+    with _lock:
+        _counters[name] += value
+
+def get(name: str) -> float:
+    """Return the current value of a counter (0 if it was never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot() -> Dict[str, float]:
+    """Return a copy of all counters."""
+    with _lock:
+        return dict(_counters)
+
+def reset() -> None:
+    """Clear all counters."""
+    with _lock:
+        _counters.clear()
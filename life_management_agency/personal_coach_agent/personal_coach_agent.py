@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from ..base_agent import BaseAgent
+from ..envelope import AgentRequest, AgentResponse
 
 class PersonalCoachAgent(BaseAgent):
     def __init__(self):
@@ -22,6 +23,12 @@ class PersonalCoachAgent(BaseAgent):
             expertise=expertise
         )
 
+    def local_recommendations(self, message: str) -> List[str]:
+        return [
+            f"{step['action']} ({step['timeframe']}): {step['outcome']}"
+            for step in self._generate_action_steps(message)
+        ]
+
     def _get_system_prompt(self) -> str:
         return """
         You are a specialized personal development coach AI agent. Your role is to help users 
@@ -51,31 +58,23 @@ class PersonalCoachAgent(BaseAgent):
         - Personal challenges
         """
 
-    async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_request(self, request: Union[AgentRequest, Dict[str, Any]]) -> AgentResponse:
         try:
             # Validate and preprocess request
             if not await self.validate_request(request):
-                return {
-                    'message': "Invalid request format. Please provide a message.",
-                    'metadata': {'error': 'Invalid request'}
-                }
+                return self._invalid_request_response()
 
-            request = await self.preprocess_request(request)
-            message = request['message']
-            context = request.get('context', {})
+            request = await self.preprocess_request(AgentRequest.coerce(request))
+            message = request.message
 
-            # Add coaching-specific context processing
-            coaching_context = self._extract_coaching_context(message)
-            context.update(coaching_context)
+            # Add coaching-specific context as a layer over the caller's context
+            request = request.with_context(self._extract_coaching_context(message))
 
             # Process with base implementation
-            response = await super().process_request({
-                'message': message,
-                'context': context
-            })
+            response = await super().process_request(request)
 
             # Add coaching-specific metadata
-            response['metadata'].update({
+            response.metadata.update({
                 'coaching_areas': self._identify_coaching_areas(message),
                 'action_steps': self._generate_action_steps(message),
                 'growth_opportunities': self._identify_growth_opportunities(message),
@@ -0,0 +1,114 @@
+"""
+Persistent user profiles with an in-process read cache.
+
+Each profile is stored as its own JSON file. Reads are served from the
+cache after the first load, and every write refreshes the cached copy and
+its ETag, so agents can read preferences such as timezone and language on
+the request path without touching the disk.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(__file__), "data", "profiles")
+
+def compute_etag(profile: Dict[str, Any]) -> str:
+    """Strong ETag for a profile, derived from its canonical JSON form."""
+    digest = hashlib.sha256(json.dumps(profile, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+class ProfileStore:
+    """File-backed profile store with a write-through read cache."""
+
+    def __init__(self, profile_dir: str = DEFAULT_PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Dict[str, Any], str]] = {}
+
+    def _path(self, user: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", user)
+        suffix = hashlib.sha1(user.encode()).hexdigest()[:8]
+        return os.path.join(self.profile_dir, f"{safe_name}-{suffix}.json")
+
+    def load_all(self) -> int:
+        """Warm the cache with every stored profile. Returns the number loaded."""
+        if not os.path.isdir(self.profile_dir):
+            return 0
+        loaded = 0
+        for name in os.listdir(self.profile_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.profile_dir, name), "r") as f:
+                    record = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                continue
+            with self._lock:
+                self._cache[record["user"]] = (record["profile"], compute_etag(record["profile"]))
+            loaded += 1
+        return loaded
+
+    def get(self, user: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return (profile, etag) for a user, loading it into the cache on a miss."""
+        with self._lock:
+            cached = self._cache.get(user)
+        if cached is not None:
+            return cached
+
+        path = self._path(user)
+        if not os.path.exists(path):
+            return None, None
+        with open(path, "r") as f:
+            profile = json.load(f)["profile"]
+        entry = (profile, compute_etag(profile))
+        with self._lock:
+            self._cache[user] = entry
+        return entry
+
+    def put(self, user: str, profile: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Replace a user's profile. Returns the stored profile and its new ETag."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = self._path(user)
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump({"user": user, "profile": profile}, f, indent=2)
+            os.replace(tmp_path, path)
+            entry = (profile, compute_etag(profile))
+            self._cache[user] = entry
+        return entry
+
+    def patch(self, user: str, changes: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """
+        Apply a partial update. Nested dicts (such as preferences) are merged
+        key by key; other fields are replaced.
+        """
+        current, _ = self.get(user)
+        updated = dict(current or {})
+        for key, value in changes.items():
+            if isinstance(value, dict) and isinstance(updated.get(key), dict):
+                updated[key] = {**updated[key], **value}
+            else:
+                updated[key] = value
+        return self.put(user, updated)
+
+    def cached_preferences(self, user: str) -> Dict[str, Any]:
+        """A user's preferences from the cache only; empty if the profile is not cached."""
+        with self._lock:
+            cached = self._cache.get(user)
+        if cached is None:
+            return {}
+        return dict(cached[0].get("preferences") or {})
+
+_profile_store: Optional[ProfileStore] = None
+
+def get_profile_store() -> ProfileStore:
+    """Return the process-wide profile store."""
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore()
+    return _profile_store
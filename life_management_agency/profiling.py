@@ -0,0 +1,210 @@
+"""
+On-demand sampling CPU profiler for live requests.
+
+Off by default. It is switched on by setting PROFILING_ADMIN_TOKEN (profile
+single requests that send "X-Profile: 1" with a matching "X-Admin-Token"
+header) and/or PROFILING_SAMPLE_RATE (profile that fraction of requests).
+When neither is set the middleware is not installed at all, so there is no
+per-request cost.
+
+While a request is profiled, a background thread samples the event loop
+thread's Python stack every few milliseconds. Samples taken while the loop
+is idle in its selector (waiting on the network) are counted separately,
+so the output shows where the loop spent CPU. Stacks are written in the
+folded format ("frame;frame;frame count" per line) read by flamegraph.pl,
+speedscope and similar tools, to PROFILING_DIR, and listed and served by
+the admin endpoints in routes/profiling.py. The loop thread is shared, so
+a profile also contains CPU time of other requests running concurrently.
+"""
+
+import os
+import sys
+import time
+import uuid
+import hmac
+import json
+import random
+import asyncio
+import threading
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from life_management_agency import metrics
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(__file__), "data", "cpu_profiles")
+
+# Leaf functions that mean the event loop is waiting, not computing
+IDLE_LEAVES = frozenset(('select', 'poll', 'epoll', 'kqueue', 'control'))
+
+def fold_stack(frame) -> str:
+    """A frame's stack as 'outermost;...;innermost', one 'function (file:line)' per frame."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.idle_samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            if frame.f_code.co_name in IDLE_LEAVES:
+                self.idle_samples += 1
+                continue
+            self.counts[fold_stack(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.counts
+
+class CpuProfileStore:
+    """Folded profiles on disk, with an in-memory index of the most recent ones."""
+
+    def __init__(self, profile_dir: str = DEFAULT_PROFILE_DIR, keep: int = 100):
+        self.profile_dir = profile_dir
+        self._index: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.profile_dir, f"{profile_id}.folded")
+
+    def save(self, profile_id: str, counts: Counter, info: Dict[str, Any]) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(self._path(profile_id), "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+        with self._lock:
+            self._index.appendleft({'id': profile_id, **info})
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._index)
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """The folded stacks of a profile, or None if it does not exist."""
+        if not all(c.isalnum() or c == '-' for c in profile_id):
+            return None
+        path = self._path(profile_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return f.read()
+
+class ProfilingMiddleware:
+    """Profile selected HTTP requests; the profile id is returned in X-Profile-Id."""
+
+    def __init__(self, app, store: CpuProfileStore, admin_token: Optional[str] = None,
+                 sample_rate: float = 0.0, interval: float = 0.005, max_concurrent: int = 2):
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self._active = 0
+
+    def _requested(self, scope) -> bool:
+        if not self.admin_token:
+            return False
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") not in ("1", "true"):
+            return False
+        return hmac.compare_digest(headers.get("x-admin-token", ""), self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+        if self._active >= self.max_concurrent:
+            metrics.increment('profiling.skipped')
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start" and requested:
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        self._active += 1
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            wall_seconds = time.perf_counter() - started
+            # Joining the sampler and writing the profile both block; keep them
+            # off the event loop being measured
+            counts = await asyncio.to_thread(sampler.stop)
+            self._active -= 1
+            cpu_samples = sum(counts.values())
+            await asyncio.to_thread(self.store.save, profile_id, counts, {
+                'path': scope.get("path"),
+                'trigger': 'header' if requested else 'sampled',
+                'created_at': time.time(),
+                'wall_seconds': round(wall_seconds, 4),
+                'cpu_samples': cpu_samples,
+                'idle_samples': sampler.idle_samples,
+                'interval_seconds': self.interval
+            })
+            metrics.increment('profiling.profiles')
+
+_cpu_profile_store: Optional[CpuProfileStore] = None
+
+def get_cpu_profile_store() -> CpuProfileStore:
+    """Return the process-wide CPU profile store."""
+    global _cpu_profile_store
+    if _cpu_profile_store is None:
+        _cpu_profile_store = CpuProfileStore(os.getenv('PROFILING_DIR', DEFAULT_PROFILE_DIR))
+    return _cpu_profile_store
+
+def profiling_settings() -> Dict[str, Any]:
+    """Profiler configuration from the environment; 'enabled' is False unless explicitly configured."""
+    admin_token = os.getenv('PROFILING_ADMIN_TOKEN') or None
+    sample_rate = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    return {
+        'enabled': bool(admin_token) or sample_rate > 0,
+        'admin_token': admin_token,
+        'sample_rate': sample_rate,
+        'interval': float(os.getenv('PROFILING_INTERVAL_MS', '5')) / 1000
+    }
+
+if __name__ == "__main__":
+    # Example usage: profile a CPU-bound function and print its hottest stacks
+    def format_context(n):
+        return "\n".join(f"{k}: {json.dumps({'value': k * 2, 'items': list(range(20))})}" for k in range(n))
+
+    def workload():
+        deadline = time.perf_counter() + 0.5
+        while time.perf_counter() < deadline:
+            format_context(200)
+
+    sampler = StackSampler(threading.get_ident(), 0.001)
+    sampler.start()
+    workload()
+    counts = sampler.stop()
+    print(f"{sum(counts.values())} samples")
+    for stack, count in counts.most_common(3):
+        print(count, stack.split(";")[-1])
@@ -0,0 +1,205 @@
+"""
+Record and replay of LLM and web search traffic.
+
+With CASSETTE_MODE=record every OpenAI chat completion and Tavily search
+is passed through to the real service and appended, with its latency, to
+a cassette file (JSONL, one interaction per line). With
+CASSETTE_MODE=replay nothing touches the network: each call is answered
+from the cassette, either after the recorded latency
+(CASSETTE_TIMING=original) or immediately (CASSETTE_TIMING=fast). That
+makes pipeline runs reproducible offline and free, for profiling and for
+comparing engine changes against the same upstream behaviour.
+
+Calls are matched on their exact request first. Prompts carry things like
+timestamps that differ between runs, so a request with no exact match
+falls back to the next unused recording with the same model and system
+prompt (or, for searches, the same query).
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from life_management_agency import metrics
+
+DEFAULT_CASSETTE_PATH = os.path.join(os.path.dirname(__file__), "data", "cassettes", "default.jsonl")
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when the cassette holds no recording for a call."""
+
+class ReplayedError(RuntimeError):
+    """A failure recorded from the real service, raised again on replay."""
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def _loose_key(kind: str, request: Dict[str, Any]) -> str:
+    if kind == 'llm':
+        system = [m.get('content') for m in request.get('messages', []) if m.get('role') == 'system'][:1]
+        return _digest([kind, request.get('model'), system])
+    return _digest([kind, ' '.join(str(request.get('query', '')).lower().split())])
+
+class Cassette:
+    """A file of recorded interactions, in record or replay mode."""
+
+    MODES = ('record', 'replay')
+    TIMINGS = ('original', 'fast')
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, mode: str = 'replay',
+                 timing: str = 'original', strict: bool = True):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {self.MODES}")
+        if timing not in self.TIMINGS:
+            raise ValueError(f"Unknown cassette timing {timing!r}; expected one of {self.TIMINGS}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        # In replay, a call with no recording raises CassetteMiss instead of going to the network
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._exact: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._loose: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        if mode == 'replay':
+            self._load()
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _load(self) -> None:
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._exact[entry['key']].append(entry)
+                self._loose[entry['loose_key']].append(entry)
+
+    def _take(self, key: str, loose_key: str) -> Optional[Dict[str, Any]]:
+        """The next unused recording for a request, exact matches first."""
+        with self._lock:
+            for queue in (self._exact.get(key), self._loose.get(loose_key)):
+                while queue:
+                    entry = queue.popleft()
+                    if not entry.get('used'):
+                        entry['used'] = True
+                        return entry
+        return None
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    async def call(self, kind: str, request: Dict[str, Any], perform: Callable[[], Awaitable[Any]],
+                   to_json: Callable[[Any], Any] = lambda value: value,
+                   from_json: Callable[[Any], Any] = lambda value: value) -> Any:
+        """Run one interaction through the cassette: record perform()'s outcome, or replay it."""
+        key = _digest([kind, request])
+        loose_key = _loose_key(kind, request)
+
+        if self.mode == 'replay':
+            entry = self._take(key, loose_key)
+            if entry is None:
+                metrics.increment(f'cassette.{kind}_misses')
+                if self.strict:
+                    raise CassetteMiss(f"No recorded {kind} interaction for this request in {self.path}")
+                return await perform()
+            metrics.increment(f'cassette.{kind}_replayed')
+            if self.timing == 'original':
+                await asyncio.sleep(entry['latency'])
+            if 'error' in entry:
+                raise ReplayedError(entry['error'])
+            return from_json(entry['response'])
+
+        started = time.monotonic()
+        entry = {'kind': kind, 'key': key, 'loose_key': loose_key, 'request': request}
+        try:
+            result = await perform()
+        except Exception as e:
+            entry.update(latency=time.monotonic() - started, error=f"{type(e).__name__}: {e}")
+            self._append(entry)
+            raise
+        entry.update(latency=time.monotonic() - started, response=to_json(result))
+        self._append(entry)
+        metrics.increment(f'cassette.{kind}_recorded')
+        return result
+
+class _CassetteCompletions:
+    def __init__(self, cassette: Cassette, client: Optional[Any]):
+        self._cassette = cassette
+        self._client = client
+
+    async def create(self, **kwargs) -> ChatCompletion:
+        return await self._cassette.call(
+            'llm', kwargs,
+            lambda: self._client.chat.completions.create(**kwargs),
+            to_json=lambda response: response.model_dump(mode='json'),
+            from_json=ChatCompletion.model_validate
+        )
+
+class _CassetteChat:
+    def __init__(self, completions: _CassetteCompletions):
+        self.completions = completions
+
+class CassetteLLMClient:
+    """Stands in for AsyncOpenAI: chat.completions.create goes through the cassette."""
+
+    def __init__(self, cassette: Cassette, client: Optional[Any] = None):
+        self.chat = _CassetteChat(_CassetteCompletions(cassette, client))
+
+_cassette: Optional[Cassette] = None
+_cassette_loaded = False
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette configured by CASSETTE_MODE, or None when recording is off."""
+    global _cassette, _cassette_loaded
+    if not _cassette_loaded:
+        mode = os.getenv('CASSETTE_MODE')
+        if mode:
+            _cassette = Cassette(
+                path=os.getenv('CASSETTE_PATH', DEFAULT_CASSETTE_PATH),
+                mode=mode,
+                timing=os.getenv('CASSETTE_TIMING', 'original'),
+                strict=os.getenv('CASSETTE_STRICT', '1') != '0'
+            )
+        _cassette_loaded = True
+    return _cassette
+
+def llm_client(**kwargs) -> Any:
+    """An AsyncOpenAI client, routed through the cassette when one is configured."""
+    cassette = get_cassette()
+    if cassette is None:
+        return openai.AsyncOpenAI(**kwargs)
+    # Replay needs no real client (and no API key) unless misses may fall through
+    real = openai.AsyncOpenAI(**kwargs) if cassette.mode == 'record' or not cassette.strict else None
+    return CassetteLLMClient(cassette, real)
+
+if __name__ == "__main__":
+    # Example usage: run messages through the agency against a cassette and report timings.
+    #   CASSETTE_MODE=record python -m life_management_agency.recording "How can I sleep better?"
+    #   CASSETTE_MODE=replay CASSETTE_TIMING=fast python -m life_management_agency.recording "How can I sleep better?"
+    import sys
+    from life_management_agency.agency import LifeManagementAgency
+
+    async def main(messages):
+        cassette = get_cassette()
+        if cassette is None:
+            print("Set CASSETTE_MODE to 'record' or 'replay'")
+            return
+        agency = LifeManagementAgency()
+        for message in messages:
+            started = time.perf_counter()
+            result = await agency.process_message(message, "cassette-user")
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"[{cassette.mode}/{cassette.timing}] {elapsed:8.1f} ms  {result['metadata'].get('synthesis')}  {message}")
+        print({k: v for k, v in metrics.snapshot().items() if k.startswith('cassette.')})
+
+    asyncio.run(main(sys.argv[1:] or ["How can I sleep better and spend more time with my family?"]))
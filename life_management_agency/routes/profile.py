@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Response
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-router = APIRouter()
+from life_management_agency.profile_store import get_profile_store
+from life_management_agency.serialization import AgencyResponse
+
+router = APIRouter(default_response_class=AgencyResponse)
 
 class ProfilePreferences(BaseModel):
     language: str
@@ -18,18 +21,60 @@ class ProfileData(BaseModel):
 class ProfileRequest(BaseModel):
     profile: ProfileData
 
-@router.post("/api/profile")
-async def update_profile(request: ProfileRequest):
-    try:
-        print(f"Received profile update request: {request.dict()}")
-        # Here you would typically update the profile in a database
-        # For now, we'll just return success with the updated profile
-        return {
+class ProfilePreferencesPatch(BaseModel):
+    language: Optional[str] = None
+    timezone: Optional[str] = None
+    theme: Optional[str] = None
+
+class ProfilePatch(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    dateJoined: Optional[str] = None
+    preferences: Optional[ProfilePreferencesPatch] = None
+
+class ProfilePatchRequest(BaseModel):
+    profile: ProfilePatch
+
+def _profile_response(profile: Dict[str, Any], etag: str) -> AgencyResponse:
+    return AgencyResponse(
+        {
             "status": "success",
             "data": {
-                "profile": request.profile.dict()
+                "profile": profile
             }
-        }
+        },
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+@router.get("/api/profile")
+async def get_profile(user: str = "user", if_none_match: Optional[str] = Header(None)):
+    profile, etag = get_profile_store().get(user)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    # The client's copy is current: skip the body
+    client_tags = [tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")]
+    if "*" in client_tags or etag in client_tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return _profile_response(profile, etag)
+
+@router.post("/api/profile")
+async def update_profile(request: ProfileRequest, user: str = "user"):
+    try:
+        profile, etag = get_profile_store().put(user, request.profile.model_dump())
+        return _profile_response(profile, etag)
+    except Exception as e:
+        print(f"Error updating profile: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@router.patch("/api/profile")
+async def patch_profile(request: ProfilePatchRequest, user: str = "user"):
+    try:
+        changes = request.profile.model_dump(exclude_unset=True)
+        profile, etag = get_profile_store().patch(user, changes)
+        return _profile_response(profile, etag)
     except Exception as e:
         print(f"Error updating profile: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,30 @@
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from life_management_agency.profiling import get_cpu_profile_store, profiling_settings
+from life_management_agency.serialization import AgencyResponse
+
+router = APIRouter(prefix="/admin/profiles", default_response_class=AgencyResponse)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints exist only when PROFILING_ADMIN_TOKEN is set, and need that token."""
+    admin_token = profiling_settings()['admin_token']
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Recent CPU profiles, newest first."""
+    return AgencyResponse({"profiles": get_cpu_profile_store().list()})
+
+@router.get("/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """A profile's folded stacks, ready for flamegraph.pl or speedscope."""
+    folded = get_cpu_profile_store().get(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
@@ -0,0 +1,251 @@
+"""
+Response serialization and compression for the agency API.
+
+AgencyResponse renders with orjson when it is installed (falling back to the
+standard json module) and switches to MessagePack for clients that send
+``Accept: application/x-msgpack``. CompressionMiddleware compresses bodies
+above a minimum size with brotli when the client and server both support it,
+and gzip otherwise.
+
+Run this module directly to benchmark serialization and wire size on a
+representative /chat payload.
+"""
+
+import json
+import zlib
+import contextvars
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional content type
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+MSGPACK_MEDIA_TYPES = ("application/x-msgpack", "application/msgpack")
+
+# Media type negotiated for the current request by ContentNegotiationMiddleware
+_response_media_type: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "response_media_type", default="application/json"
+)
+
+def _default(value: Any) -> Any:
+    """Fallback for values neither encoder handles natively (sets, datetimes, models)."""
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+class AgencyResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, or MessagePack when the client asked
+    for it. Returning one directly from a handler also skips FastAPI's
+    jsonable_encoder pass over the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if _response_media_type.get() in MSGPACK_MEDIA_TYPES:
+            self.media_type = _response_media_type.get()
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+def negotiate_media_type(accept: str) -> str:
+    """Pick MessagePack only if the client lists it and the encoder is available."""
+    if msgpack is None:
+        return "application/json"
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        media_type = media_type.strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES and "q=0" != params.replace(" ", "").lower():
+            return media_type
+    return "application/json"
+
+class ContentNegotiationMiddleware:
+    """Record the negotiated response media type for AgencyResponse to pick up."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _response_media_type.set(negotiate_media_type(Headers(scope=scope).get("accept", "")))
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).add_vary_header("Accept")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            _response_media_type.reset(token)
+
+class _Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if final else self._compressor.flush())
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least minimum_size bytes, preferring brotli over
+    gzip according to the client's Accept-Encoding. Smaller responses and
+    bodies that are already encoded pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        offered = {
+            part.partition(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+            if "q=0" != part.partition(";")[2].replace(" ", "").lower()
+        }
+        if brotli is not None and "br" in offered:
+            return "br"
+        if "gzip" in offered:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                if "content-encoding" in Headers(raw=message["headers"]):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk decides the encoding
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body, final=not more_body)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, final=not more_body),
+                "more_body": more_body
+            })
+
+        await self.app(scope, receive, send_compressed)
+
+if __name__ == "__main__":
+    # Benchmark: serialization CPU and wire size for a typical multi-agent /chat response
+    import gzip
+    import timeit
+    from fastapi.encoders import jsonable_encoder
+
+    recommendations = [f"Recommendation {i}: take a 20 minute walk after lunch to improve energy and focus" for i in range(12)]
+    payload = {
+        "message": "Here is your combined plan for the week. " * 40,
+        "metadata": {
+            "involved_agents": ["master_agent", "health_agent", "lifestyle_agent", "personal_coach_agent"],
+            "thought_process": [f"Step {i}: analysed the request against domain {i % 4}" for i in range(20)],
+            "synthesis": "llm",
+            "mode": "full",
+            "agent_responses": {
+                agent: {
+                    "message": f"{agent} suggests a balanced routine. " * 25,
+                    "metadata": {"recommendations": recommendations, "confidence": 0.87, "usage": {"total_tokens": 812}}
+                }
+                for agent in ("health_agent", "lifestyle_agent", "personal_coach_agent")
+            }
+        }
+    }
+
+    def stdlib_path():
+        # What FastAPI does by default for a returned dict
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    runs = 2000
+    candidates = [("fastapi default (jsonable_encoder + json)", stdlib_path)]
+    if orjson is not None:
+        candidates.append(("orjson", lambda: dumps_json(payload)))
+    if msgpack is not None:
+        candidates.append(("msgpack", lambda: dumps_msgpack(payload)))
+
+    print(f"{'encoder':<44}{'us/op':>10}{'bytes':>10}")
+    for name, encode in candidates:
+        seconds = timeit.timeit(encode, number=runs)
+        print(f"{name:<44}{seconds / runs * 1e6:>10.1f}{len(encode()):>10}")
+
+    body = dumps_json(payload)
+    print(f"\nwire size of the JSON body ({len(body)} bytes)")
+    print(f"{'gzip level 6':<44}{len(gzip.compress(body, compresslevel=6)):>20}")
+    if brotli is not None:
+        print(f"{'brotli quality 4':<44}{len(brotli.compress(body, quality=4)):>20}")
@@ -0,0 +1,171 @@
+"""
+Incremental podcast feed ingestion.
+
+Feeds are fetched with ETag/Last-Modified conditional requests and parsed
+as a stream, stopping as soon as the parser reaches episodes at or below the
+feed's stored high-water mark. Only episodes newer than that mark are
+returned, so unchanged feeds cost a 304 and changed feeds are read only
+as far as their new items.
+"""
+
+import os
+import json
+import asyncio
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "social")
+DEFAULT_STATE_PATH = os.path.join(DATA_DIR, "feed_state.json")
+
+ITUNES_NS = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+
+def configured_feed_urls() -> List[str]:
+    """Feed URLs from the comma-separated PODCAST_FEED_URLS environment variable."""
+    return [url.strip() for url in os.getenv("PODCAST_FEED_URLS", "").split(",") if url.strip()]
+
+def _parse_item(item: ET.Element) -> Dict[str, Any]:
+    """Convert an RSS <item> into the episode shape used by PodcastAutopostTool."""
+    pub_date = item.findtext("pubDate")
+    try:
+        published = parsedate_to_datetime(pub_date).timestamp() if pub_date else 0.0
+    except (TypeError, ValueError):
+        published = 0.0
+    enclosure = item.find("enclosure")
+    link = item.findtext("link") or ""
+    return {
+        "title": (item.findtext("title") or "").strip(),
+        "description": (item.findtext("description") or "").strip(),
+        "publishDate": parsedate_to_datetime(pub_date).date().isoformat() if published else "",
+        "duration": item.findtext(f"{ITUNES_NS}duration") or "",
+        "guid": item.findtext("guid") or link or (item.findtext("title") or ""),
+        "link": link,
+        "audioUrl": enclosure.get("url", "") if enclosure is not None else "",
+        "published": published
+    }
+
+class FeedIngestor:
+    """Polls podcast RSS feeds and returns only episodes newer than each feed's high-water mark."""
+
+    def __init__(self, state_path: str = DEFAULT_STATE_PATH, feed_urls: Optional[List[str]] = None,
+                 max_concurrency: int = 5, timeout: float = 30.0, backfill: int = 1):
+        self.state_path = state_path
+        self.feed_urls = feed_urls if feed_urls is not None else configured_feed_urls()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # Episodes to take from a feed seen for the first time
+        self.backfill = backfill
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _save_state(self) -> None:
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    async def poll(self, url: str, client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+        """Fetch one feed and return its new episodes, oldest first."""
+        if client is None:
+            async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as own_client:
+                return await self.poll(url, own_client)
+
+        feed_state = self.state.get(url, {})
+        headers = {}
+        if feed_state.get("etag"):
+            headers["If-None-Match"] = feed_state["etag"]
+        if feed_state.get("last_modified"):
+            headers["If-Modified-Since"] = feed_state["last_modified"]
+
+        high_water = feed_state.get("high_water")
+        episodes: List[Dict[str, Any]] = []
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return []
+            response.raise_for_status()
+
+            parser = ET.XMLPullParser(events=("end",))
+            done = False
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                for _, element in parser.read_events():
+                    if element.tag != "item":
+                        continue
+                    episode = _parse_item(element)
+                    element.clear()
+                    if high_water is None:
+                        episodes.append(episode)
+                        done = len(episodes) >= self.backfill
+                    elif episode["published"] > high_water["published"] or (
+                            episode["published"] == high_water["published"] and episode["guid"] not in high_water["guids"]):
+                        episodes.append(episode)
+                    else:
+                        # Feeds list newest first, so everything after this was seen already
+                        done = True
+                    if done:
+                        break
+                if done:
+                    break
+
+            feed_state = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "high_water": high_water
+            }
+
+        if episodes:
+            newest = max(episode["published"] for episode in episodes)
+            if high_water is None or newest > high_water["published"]:
+                guids = []
+            else:
+                guids = list(high_water["guids"])
+            guids += [e["guid"] for e in episodes if e["published"] == newest]
+            feed_state["high_water"] = {"published": newest, "guids": guids}
+        self.state[url] = feed_state
+        self._save_state()
+        return sorted(episodes, key=lambda episode: episode["published"])
+
+    async def poll_all(self, urls: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Poll several feeds concurrently. Failed feeds map to their exception."""
+        urls = urls if urls is not None else self.feed_urls
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True, limits=limits) as client:
+            async def poll_one(url: str):
+                async with semaphore:
+                    return await self.poll(url, client)
+            results = await asyncio.gather(*(poll_one(url) for url in urls), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    async def watch(self, on_episode: Callable[[Dict[str, Any]], Awaitable[None]], interval: float = 900.0) -> None:
+        """Poll the configured feeds forever, passing each new episode to on_episode."""
+        while True:
+            for url, episodes in (await self.poll_all()).items():
+                if isinstance(episodes, Exception):
+                    print(f"Error polling feed {url}: {episodes}")
+                    continue
+                for episode in episodes:
+                    await on_episode(episode)
+            await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    # Example usage: poll the feeds listed in PODCAST_FEED_URLS twice
+    async def main():
+        ingestor = FeedIngestor()
+        for _ in range(2):
+            for url, episodes in (await ingestor.poll_all()).items():
+                print(url, episodes if isinstance(episodes, Exception) else [e["title"] for e in episodes])
+
+    asyncio.run(main())
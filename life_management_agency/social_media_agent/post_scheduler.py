@@ -0,0 +1,286 @@
+"""
+Durable scheduler for social media posts.
+
+Jobs are stored in SQLite so they survive restarts. A single async
+dispatcher keeps due times in a heap and sleeps until the earliest one, so
+an idle scheduler costs no CPU however many posts are queued. Failed posts
+are retried with exponential backoff. Posts submitted with a dedupe key
+(such as an episode guid) are stored once per user and platform, so
+submitting the same episode again returns the existing jobs.
+"""
+
+import os
+import json
+import time
+import heapq
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "social")
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "scheduled_posts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    dedupe_key TEXT,
+    run_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user_status ON jobs (user, status);
+"""
+
+# Created after migrating older databases, which lack the dedupe_key column.
+# NULL keys never conflict, so posts without a key are not deduplicated.
+DEDUPE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (user, platform, dedupe_key)"
+
+def next_occurrence(time_of_day: str, now: Optional[datetime] = None) -> datetime:
+    """Next local datetime at an "HH:MM" time of day."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in time_of_day.split(":"))
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+class LocalPublisher:
+    """Stand-in publisher that records posts locally instead of calling social networks."""
+
+    def __init__(self, log_path: Optional[str] = os.path.join(DATA_DIR, "published_posts.jsonl")):
+        self.log_path = log_path
+        self.published: List[Dict[str, Any]] = []
+
+    async def publish(self, post: Dict[str, Any]) -> None:
+        record = {**post, "published_at": datetime.now().isoformat()}
+        self.published.append(record)
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+class PostScheduler:
+    """Persistent job store plus heap-based async dispatcher for scheduled posts."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 publish: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                 max_attempts: int = 5, retry_base_delay: float = 30.0, max_concurrency: int = 10):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.publish = publish or LocalPublisher().publish
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "dedupe_key" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+        self._conn.execute(DEDUPE_INDEX)
+        self._heap: List[tuple] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+    # Job store
+
+    def submit(self, user: str, platform: str, content: str, run_at: Union[datetime, float],
+               metadata: Optional[Dict[str, Any]] = None, dedupe_key: Optional[str] = None) -> int:
+        """
+        Persist a post and schedule it. run_at is a datetime or a Unix timestamp.
+        If the user already has a post for the platform with the same
+        dedupe_key, nothing is stored and the existing job's id is returned.
+        """
+        if isinstance(run_at, datetime):
+            run_at = run_at.timestamp()
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (user, platform, content, metadata, dedupe_key, run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, platform, content, json.dumps(metadata or {}), dedupe_key, run_at, now, now)
+            )
+            if cursor.rowcount == 0:
+                return self._conn.execute(
+                    "SELECT id FROM jobs WHERE user = ? AND platform = ? AND dedupe_key = ?",
+                    (user, platform, dedupe_key)
+                ).fetchone()["id"]
+            job_id = cursor.lastrowid
+        self._push(run_at, job_id)
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a pending post. Returns False if it already ran or does not exist."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'pending'",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, user: str, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM jobs WHERE user = ?"
+        params: list = [user]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY run_at LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["metadata"] = json.loads(job["metadata"])
+        job["scheduledTime"] = datetime.fromtimestamp(job["run_at"]).isoformat()
+        return job
+
+    def _update(self, job_id: int, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    # Dispatcher
+
+    def _push(self, run_at: float, job_id: int) -> None:
+        with self._lock:
+            earliest = self._heap[0][0] if self._heap else None
+            heapq.heappush(self._heap, (run_at, job_id))
+        # Only the dispatcher's sleep deadline can change, so wake it just for a new earliest job
+        if self._loop is not None and (earliest is None or run_at < earliest):
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        """Recover persisted jobs and start dispatching."""
+        if self._runner is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        with self._lock, self._conn:
+            # Jobs that were running when the process stopped are retried
+            self._conn.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+            rows = self._conn.execute("SELECT id, run_at FROM jobs WHERE status = 'pending'").fetchall()
+            self._heap = [(row["run_at"], row["id"]) for row in rows]
+            heapq.heapify(self._heap)
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop dispatching; pending jobs stay in the store."""
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+        self._loop = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _run(self) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                next_run_at = self._heap[0][0] if self._heap else None
+            if next_run_at is None:
+                await self._wakeup.wait()
+                continue
+            delay = next_run_at - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            with self._lock:
+                run_at, job_id = heapq.heappop(self._heap)
+            job = self.get_job(job_id)
+            # Skip cancelled, finished or rescheduled jobs left in the heap
+            if job is None or job["status"] != "pending" or job["run_at"] != run_at:
+                continue
+
+            await semaphore.acquire()
+            self._update(job_id, status="running")
+            task = asyncio.create_task(self._dispatch(job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+    async def _dispatch(self, job: Dict[str, Any]) -> None:
+        attempts = job["attempts"] + 1
+        try:
+            await self.publish({
+                "id": job["id"],
+                "user": job["user"],
+                "platform": job["platform"],
+                "content": job["content"],
+                "metadata": job["metadata"],
+                "scheduledTime": job["scheduledTime"]
+            })
+            self._update(job["id"], status="published", attempts=attempts, last_error=None)
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                self._update(job["id"], status="failed", attempts=attempts, last_error=str(e))
+                return
+            retry_at = time.time() + self.retry_base_delay * 2 ** (attempts - 1)
+            self._update(job["id"], status="pending", attempts=attempts, last_error=str(e), run_at=retry_at)
+            self._push(retry_at, job["id"])
+
+_post_scheduler: Optional[PostScheduler] = None
+
+def get_post_scheduler() -> PostScheduler:
+    """Return the process-wide post scheduler."""
+    global _post_scheduler
+    if _post_scheduler is None:
+        _post_scheduler = PostScheduler()
+    return _post_scheduler
+
+if __name__ == "__main__":
+    # Example usage: schedule two posts a second apart and let them publish
+    import tempfile
+
+    async def main():
+        publisher = LocalPublisher(log_path=None)
+        scheduler = PostScheduler(os.path.join(tempfile.mkdtemp(), "posts.db"), publish=publisher.publish)
+        await scheduler.start()
+        scheduler.submit("user", "Twitter", "New episode is out!", time.time() + 1)
+        scheduler.submit("user", "LinkedIn", "Check out our latest episode", time.time() + 2)
+        # Submitting the same episode again is a no-op
+        first = scheduler.submit("user", "Twitter", "Episode 1 is out!", time.time() + 1, dedupe_key="episode-1")
+        again = scheduler.submit("user", "Twitter", "Episode 1 is out!", time.time() + 1, dedupe_key="episode-1")
+        assert first == again
+        await asyncio.sleep(2.5)
+        await scheduler.stop()
+        print(publisher.published)
+        print(scheduler.stats())
+
+    asyncio.run(main())
@@ -1,8 +1,20 @@
+import time
+import asyncio
 from life_management_agency.base_agent import BaseAgent
+from life_management_agency.envelope import AgentRequest, AgentResponse
 from life_management_agency.tools.SimpleCommunicationTool import SimpleCommunicationTool
 from .tools import PodcastAutopostTool
+from .post_scheduler import get_post_scheduler, next_occurrence
+from .feed_ingestor import FeedIngestor
 
 class SocialMediaAgent(BaseAgent):
+    PLATFORM_GUIDELINES = {
+        "Twitter": "At most 280 characters, one or two hashtags, a hook in the first line.",
+        "LinkedIn": "Two to four short paragraphs, professional tone, end with a question.",
+        "Instagram": "Conversational caption with line breaks and up to five hashtags.",
+        "Facebook": "Friendly and informal, one to three sentences with a call to action."
+    }
+
     def __init__(self):
         expertise = [
             "Social media management",
@@ -23,34 +35,50 @@ class SocialMediaAgent(BaseAgent):
             expertise=expertise
         )
         self.podcast_tool = PodcastAutopostTool()
+        self.scheduler = get_post_scheduler()
+        self.feed_ingestor = FeedIngestor()
+        self.last_batch_stats = {}
 
-    async def process_request(self, request: dict) -> dict:
+    async def process_request(self, request) -> AgentResponse:
         try:
-            message = request.get('message', '')
-            context = request.get('context', {})
+            if not await self.validate_request(request):
+                return self._invalid_request_response()
+            request = AgentRequest.coerce(request)
             
             # Process the request using the base agent's functionality
             response = await super().process_request(request)
             
             # Add social media specific processing if needed
-            if 'podcast' in message.lower():
-                episode_info = self.handle_new_episode()
+            if 'podcast' in request.message.lower():
+                # Scheduling writes to SQLite, so it runs off the event loop
+                episode_info = await asyncio.to_thread(self.handle_new_episode, user=request.user)
                 if episode_info['status'] == 'success':
-                    response['message'] += f"\n\nI've also prepared social media posts for the latest podcast episode: {episode_info['episode']['title']}"
+                    response.message += f"\n\nI've also prepared social media posts for the latest podcast episode: {episode_info['episode']['title']}"
             
             return response
         except Exception as e:
             return await self.handle_error(e)
 
-    def handle_new_episode(self):
+    def handle_new_episode(self, user="user", episode=None):
         """Handle new podcast episode posting"""
         # Get latest episode
-        episode = self.podcast_tool.get_latest_episode()
+        episode = episode or self.podcast_tool.get_latest_episode()
         if not episode:
             return {"status": "error", "message": "No episode found"}
 
-        # Schedule 5 posts throughout the day
-        posts = self.podcast_tool.schedule_social_posts(episode)
+        # Submit the planned posts to the scheduler, which publishes them when due.
+        # Posts are keyed by episode, so handling the same episode again (every
+        # chat mentioning a podcast, or a feed re-poll) returns the jobs already
+        # scheduled instead of publishing duplicates.
+        episode_key = episode.get("guid") or episode.get("title")
+        posts = []
+        for post in self.podcast_tool.schedule_social_posts(episode):
+            job_id = self.scheduler.submit(
+                user, post["platform"], post["content"], next_occurrence(post["scheduledTime"]),
+                metadata={"episode": episode.get("title")}, dedupe_key=episode_key
+            )
+            job = self.scheduler.get_job(job_id)
+            posts.append({**post, "id": job_id, "scheduledTime": job["scheduledTime"], "status": job["status"]})
         
         return {
             "status": "success",
@@ -58,7 +86,113 @@ class SocialMediaAgent(BaseAgent):
             "scheduled_posts": posts
         }
 
+    async def ingest_feeds(self, user="user"):
+        """Poll the configured podcast feeds and schedule posts for each new episode"""
+        results = []
+        for url, episodes in (await self.feed_ingestor.poll_all()).items():
+            if isinstance(episodes, Exception):
+                results.append({"status": "error", "feed": url, "message": str(episodes)})
+                continue
+            for episode in episodes:
+                results.append(await asyncio.to_thread(self.handle_new_episode, user=user, episode=episode))
+        return results
+
+    def _content_system_prompt(self, platforms):
+        """Prompt scaffolding shared by every post in a batch."""
+        guidelines = "\n".join(
+            f"- {platform}: {self.PLATFORM_GUIDELINES.get(platform, 'Follow the platform conventions.')}"
+            for platform in platforms
+        )
+        return f"""
+        {self._get_system_prompt()}
+
+        You write social media posts. Platform guidelines:
+        {guidelines}
+
+        Reply with the post text only.
+        """
+
+    async def generate_content_batch(self, items, platforms, max_concurrency=5):
+        """
+        Generate posts for many episodes or topics across platforms concurrently.
+
+        items are episode dicts or topic strings. Yields one result per
+        (item, platform) pair as soon as it is ready; throughput figures for the
+        run are left in self.last_batch_stats.
+        """
+        system_prompt = self._content_system_prompt(platforms)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.perf_counter()
+
+        async def generate(item, platform):
+            async with semaphore:
+                item_started = time.perf_counter()
+                if isinstance(item, dict):
+                    subject = f"New podcast episode: {item.get('title', '')}\n{item.get('description', '')}"
+                else:
+                    subject = f"Topic: {item}"
+                try:
+                    response = await self._create_completion([
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": f"Platform: {platform}\n{subject}"}
+                    ])
+                    result = {"status": "success", "content": response.choices[0].message.content}
+                except Exception as e:
+                    result = {"status": "error", "message": str(e)}
+                return {
+                    "item": item,
+                    "platform": platform,
+                    **result,
+                    "elapsed_ms": round((time.perf_counter() - item_started) * 1000, 2)
+                }
+
+        tasks = [asyncio.create_task(generate(item, platform)) for item in items for platform in platforms]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            elapsed = time.perf_counter() - started
+            self.last_batch_stats = {
+                "posts": len(tasks),
+                "max_concurrency": max_concurrency,
+                "seconds": round(elapsed, 3),
+                "posts_per_second": round(len(tasks) / elapsed, 2) if elapsed else 0.0
+            }
+
     def generate_content(self, topic=None):
         """Generate original content"""
         content = self.podcast_tool.generate_original_content(topic)
         return content
+
+if __name__ == "__main__":
+    # Example usage: compare serial and concurrent batch generation against a
+    # stubbed completion with a fixed 100 ms latency (no API calls are made)
+    import os
+    import sys
+    import types
+    import tempfile
+
+    # Keep the stub's token usage out of the real usage ledger
+    os.environ.setdefault("USAGE_DIR", tempfile.mkdtemp())
+
+    class StubCompletions:
+        async def create(self, model=None, messages=None, **kwargs):
+            await asyncio.sleep(0.1)
+            return types.SimpleNamespace(
+                choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=f"Post for {messages[-1]['content'][:40]}"))],
+                usage=types.SimpleNamespace(prompt_tokens=200, completion_tokens=60, total_tokens=260)
+            )
+
+    async def main(episode_count, concurrency):
+        agent = SocialMediaAgent()
+        agent.llm = types.SimpleNamespace(chat=types.SimpleNamespace(completions=StubCompletions()))
+        episodes = [{"title": f"Episode {n}", "description": "A conversation about habits."} for n in range(episode_count)]
+        for max_concurrency in (1, concurrency):
+            async for _ in agent.generate_content_batch(episodes, ["Twitter", "LinkedIn"], max_concurrency=max_concurrency):
+                pass
+            print(agent.last_batch_stats)
+
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 12,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 8))
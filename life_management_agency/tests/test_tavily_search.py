@@ -0,0 +1,150 @@
+"""
+TavilySearchClient against a local stand-in for the Tavily API.
+
+The stand-in is a plain http.server on localhost that answers POST /search
+after a configurable delay and counts the requests it receives, so the tests
+can check caching and sharing of concurrent searches without the network.
+"""
+
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from life_management_agency.deadline import DeadlineExceeded, deadline_after, deadline_scope
+from life_management_agency.knowledge_agent.tools import TavilySearchTool as tavily
+from life_management_agency.knowledge_agent.tools.TavilySearchTool import TavilySearchClient
+
+class StandIn:
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stand_in.requests.append(body)
+                time.sleep(stand_in.delay)
+                payload = json.dumps({
+                    'query': body['query'],
+                    'results': [{'title': 'Result', 'url': 'https://example.com', 'content': body['query']}]
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    server = StandIn()
+    monkeypatch.setattr(tavily, 'tavily_api_url', server.url)
+    monkeypatch.setattr(tavily, 'tavily_api_key', 'test-key')
+    yield server
+    server.close()
+
+def run(coroutine_function):
+    async def with_client():
+        client = TavilySearchClient()
+        try:
+            return await coroutine_function(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(with_client())
+
+async def received(stand_in, count=1):
+    """Wait until the stand-in has received count requests."""
+    while len(stand_in.requests) < count:
+        await asyncio.sleep(0.005)
+
+def test_search_posts_query_to_configured_url(stand_in):
+    result = run(lambda client: client.search("Spaced repetition"))
+    assert result['query'] == "Spaced repetition"
+    assert stand_in.requests == [{'api_key': 'test-key', 'query': "Spaced repetition"}]
+
+def test_repeated_search_is_served_from_cache(stand_in):
+    async def scenario(client):
+        first = await client.search("spaced repetition")
+        second = await client.search("  Spaced   REPETITION ")
+        return first, second
+
+    first, second = run(scenario)
+    assert first == second
+    assert len(stand_in.requests) == 1
+
+def test_concurrent_identical_searches_share_one_request(stand_in):
+    results = run(lambda client: client.search_many(["spaced repetition"] * 5))
+    assert all(result['query'] == "spaced repetition" for result in results)
+    assert len(stand_in.requests) == 1
+
+def test_cancelling_one_caller_does_not_cancel_the_others(stand_in):
+    async def scenario(client):
+        first = asyncio.create_task(client.search("spaced repetition"))
+        await received(stand_in)
+        second = asyncio.create_task(client.search("spaced repetition"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result
+
+    result = run(scenario)
+    assert result['query'] == "spaced repetition"
+    assert len(stand_in.requests) == 1
+
+def test_search_is_abandoned_when_every_caller_is_cancelled(stand_in):
+    async def scenario(client):
+        task = asyncio.create_task(client.search("spaced repetition"))
+        await received(stand_in)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert client._in_flight == {}
+        # Nothing was cached, so the next search goes upstream again
+        return await client.search("spaced repetition")
+
+    result = run(scenario)
+    assert result['query'] == "spaced repetition"
+    assert len(stand_in.requests) == 2
+
+def test_shared_search_is_bounded_by_each_callers_own_deadline(stand_in):
+    async def search_with_deadline(client, seconds):
+        with deadline_scope(deadline_after(seconds)):
+            return await client.search("spaced repetition")
+
+    async def scenario(client):
+        # The first caller starts the search with a deadline shorter than the upstream latency
+        hurried = asyncio.create_task(search_with_deadline(client, 0.1))
+        await received(stand_in)
+        patient = asyncio.create_task(search_with_deadline(client, 10))
+        with pytest.raises(DeadlineExceeded):
+            await hurried
+        return await patient
+
+    result = run(scenario)
+    assert result['query'] == "spaced repetition"
+    assert len(stand_in.requests) == 1
+
+def test_search_is_skipped_when_the_deadline_has_passed(stand_in):
+    async def scenario(client):
+        with deadline_scope(deadline_after(0)):
+            with pytest.raises(DeadlineExceeded):
+                await client.search("spaced repetition")
+
+    run(scenario)
+    assert stand_in.requests == []
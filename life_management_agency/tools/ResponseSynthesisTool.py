@@ -10,6 +10,10 @@ class ResponseSynthesisTool(BaseTool):
         ..., 
         description="Dictionary of agent responses with agent names as keys"
     )
+    deduplicate: bool = Field(
+        False,
+        description="Drop points that an earlier agent already made"
+    )
 
     def run(self) -> str:
         """
@@ -24,10 +28,16 @@ class ResponseSynthesisTool(BaseTool):
             
         # Extract and combine key points
         combined_response = "Here's what you need to know:\n\n"
+        seen_points = set()
         
         for agent_name, response in self.responses.items():
             # Split response into bullet points
             points = [p.strip() for p in response.split('\n') if p.strip()]
+            if self.deduplicate:
+                points = [p for p in points if self._normalize(p) not in seen_points]
+                seen_points.update(self._normalize(p) for p in points)
+                if not points:
+                    continue
             
             # Add section for each agent
             combined_response += f"• {agent_name.replace('_', ' ').title()} Insights:\n"
@@ -38,6 +48,12 @@ class ResponseSynthesisTool(BaseTool):
             
         return combined_response.strip()
 
+    @staticmethod
+    def _normalize(point: str) -> str:
+        """Normalize a point for duplicate detection (case, bullets and punctuation)."""
+        words = ''.join(c if c.isalnum() else ' ' for c in point.lower()).split()
+        return ' '.join(words)
+
 if __name__ == "__main__":
     responses = {
         "health_agent": "Exercise daily\nEat balanced meals",
@@ -1,10 +1,12 @@
 from agency_swarm.tools import BaseTool
 from pydantic import Field
 from typing import Optional, List, Dict, Any
-from openai import AsyncOpenAI
 import os
 from dotenv import load_dotenv
 import logging
+from life_management_agency.conversation_memory import ConversationMemory, summary_prompt
+from life_management_agency.recording import llm_client
+from life_management_agency.usage_accounting import get_usage_ledger
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,11 +15,29 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Initialize AsyncOpenAI client once
-client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Initialize AsyncOpenAI client once (through the cassette when CASSETTE_MODE is set)
+client = llm_client(api_key=os.getenv('OPENAI_API_KEY'))
+
+def _record_usage(model: str, chat_completion) -> None:
+    usage = getattr(chat_completion, 'usage', None)
+    get_usage_ledger().record('simple_communication_tool', model, {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0
+    })
+
+async def _summarize(summary: str, turns: List[Dict[str, str]]) -> str:
+    model = get_usage_ledger().model_for("gpt-4o")
+    chat_completion = await client.chat.completions.create(
+        model=model,
+        messages=summary_prompt(summary, turns),
+        temperature=0.3,
+        max_tokens=400
+    )
+    _record_usage(model, chat_completion)
+    return chat_completion.choices[0].message.content
 
-# Chat history store
-chat_histories = {}
+# Chat history store: recent turns verbatim, older turns folded into a summary
+conversation_memory = ConversationMemory(_summarize)
 
 class SimpleCommunicationTool(BaseTool):
     """
@@ -65,13 +85,13 @@ class SimpleCommunicationTool(BaseTool):
             if not os.getenv('OPENAI_API_KEY'):
                 raise ValueError("OpenAI API key not found in environment variables")
 
-            # Initialize or get chat history
+            # Get chat history and the summary of anything older
             if self.session_id:
-                if self.session_id not in chat_histories:
-                    chat_histories[self.session_id] = []
-                history = chat_histories[self.session_id]
+                history = conversation_memory.history(self.session_id)
+                summary = conversation_memory.summary(self.session_id)
             else:
                 history = []
+                summary = ""
 
             # Prepare the system message based on agent type
             system_message = self._get_system_message(self.agent)
@@ -93,6 +113,8 @@ class SimpleCommunicationTool(BaseTool):
             messages = [
                 {"role": "system", "content": system_message}
             ]
+            if summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
             
             # Add chat history
             messages.extend(history)
@@ -104,12 +126,14 @@ class SimpleCommunicationTool(BaseTool):
 
             try:
                 # Get response from OpenAI
+                model = get_usage_ledger().model_for("gpt-4o")
                 chat_completion = await client.chat.completions.create(
-                    model="gpt-4o",
+                    model=model,
                     messages=messages,
                     temperature=0.7,
                     max_tokens=1000
                 )
+                _record_usage(model, chat_completion)
 
                 logger.debug(f"Received response from OpenAI: {chat_completion}")
 
@@ -118,10 +142,7 @@ class SimpleCommunicationTool(BaseTool):
 
                 # Update chat history if session_id is provided
                 if self.session_id:
-                    history.append({"role": "user", "content": enhanced_message})
-                    history.append({"role": "assistant", "content": ai_response})
-                    # Keep only last 10 messages to prevent context length issues
-                    chat_histories[self.session_id] = history[-10:]
+                    conversation_memory.record_turn(self.session_id, self.message, ai_response)
 
                 # Update response structure
                 response['response'] = ai_response
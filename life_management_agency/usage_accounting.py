@@ -0,0 +1,319 @@
+"""
+Token and cost accounting for LLM calls, with per-user and per-day budgets.
+
+Every completion's usage is recorded against the agent that made it, the
+model, the user and the request it belongs to. The user and request come
+from a request scope opened by the API around the pipeline; tasks started
+inside it inherit the scope through a context variable. Cost is estimated
+from a per-model price table.
+
+Budgets are daily and optional: a token and/or cost limit per user
+(USAGE_USER_DAILY_TOKENS, USAGE_USER_DAILY_COST, with per-user overrides
+in USAGE_USER_BUDGETS) and a cost limit for all users together
+(USAGE_DAILY_COST). Past USAGE_DOWNGRADE_AT of a budget, calls are
+switched to the cheaper USAGE_DOWNGRADE_MODEL; past the whole budget, new
+requests are refused until the next day. Records are appended to a daily
+JSONL file so the day's totals survive a restart.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+DEFAULT_USAGE_DIR = os.path.join(os.path.dirname(__file__), "data", "usage")
+
+# USD per million tokens: (prompt, completion)
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    'gpt-4': (30.0, 60.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+
+def price_for(model: str) -> Tuple[float, float]:
+    """Prices of a model, matching dated variants by their longest known prefix."""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    prefixes = [name for name in MODEL_PRICES if (model or '').startswith(name)]
+    if prefixes:
+        return MODEL_PRICES[max(prefixes, key=len)]
+    # Unknown models are priced like the most expensive one rather than as free
+    return MODEL_PRICES['gpt-4']
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = price_for(model)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def _empty_totals() -> Dict[str, float]:
+    return {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cost': 0.0}
+
+def _add(totals: Dict[str, float], prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+    totals['calls'] += 1
+    totals['prompt_tokens'] += prompt_tokens
+    totals['completion_tokens'] += completion_tokens
+    totals['total_tokens'] += prompt_tokens + completion_tokens
+    totals['cost'] += cost
+
+def _rounded(totals: Dict[str, float]) -> Dict[str, float]:
+    return {**totals, 'cost': round(totals['cost'], 6)}
+
+def _today() -> str:
+    return datetime.now().date().isoformat()
+
+def _seconds_until_tomorrow() -> int:
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((tomorrow - now).total_seconds()))
+
+class BudgetExceeded(Exception):
+    """Raised when a user, or the agency as a whole, has used up today's budget."""
+
+    def __init__(self, user: str, scope: str, retry_after: int):
+        super().__init__(f"Daily {scope} budget exhausted, retry after {retry_after}s")
+        self.user = user
+        self.scope = scope
+        self.retry_after = retry_after
+
+class RequestUsage:
+    """Usage of one request, accumulated while its pipeline runs."""
+
+    __slots__ = ('request_id', 'user', 'totals', 'by_agent', 'downgraded')
+
+    def __init__(self, user: str, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.user = user
+        self.totals = _empty_totals()
+        self.by_agent: Dict[str, Dict[str, float]] = {}
+        self.downgraded = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'request_id': self.request_id,
+            **_rounded(self.totals),
+            'by_agent': {agent: _rounded(totals) for agent, totals in self.by_agent.items()},
+            'downgraded': self.downgraded
+        }
+
+_current_request: ContextVar[Optional[RequestUsage]] = ContextVar('request_usage', default=None)
+
+class UsageLedger:
+    """Aggregates LLM usage by agent, model, user and day, and enforces daily budgets."""
+
+    def __init__(self, usage_dir: str = DEFAULT_USAGE_DIR, user_daily_tokens: int = 0,
+                 user_daily_cost: float = 0.0, daily_cost: float = 0.0, downgrade_at: float = 0.8,
+                 downgrade_model: str = 'gpt-4o-mini', user_budgets: Optional[Dict[str, Dict[str, float]]] = None):
+        self.usage_dir = usage_dir
+        # Zero means no limit
+        self.user_daily_tokens = user_daily_tokens
+        self.user_daily_cost = user_daily_cost
+        self.daily_cost = daily_cost
+        self.downgrade_at = downgrade_at
+        self.downgrade_model = downgrade_model
+        self.user_budgets = user_budgets or {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._totals = _empty_totals()
+        self._by_agent: Dict[str, Dict[str, float]] = {}
+        self._by_model: Dict[str, Dict[str, float]] = {}
+        self._by_user: Dict[str, Dict[str, float]] = {}
+        self._day = _today()
+        self._day_totals = _empty_totals()
+        self._day_by_user: Dict[str, Dict[str, float]] = {}
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.usage_dir, f"{day}.jsonl")
+
+    def load(self) -> None:
+        """Rebuild today's totals from today's log, so budgets hold across restarts."""
+        path = self._path(_today())
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        with self._lock:
+            for record in records:
+                self._add_record(record)
+
+    @contextmanager
+    def request_scope(self, user: str, request_id: Optional[str] = None) -> Iterator[RequestUsage]:
+        """Attribute LLM calls made inside the block (and tasks started in it) to this user and request."""
+        request_usage = RequestUsage(user, request_id)
+        token = _current_request.set(request_usage)
+        try:
+            yield request_usage
+        finally:
+            _current_request.reset(token)
+
+    def _roll_day(self) -> None:
+        # Call with the lock held
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._day_totals = _empty_totals()
+            self._day_by_user = {}
+
+    def _add_record(self, record: Dict[str, Any]) -> None:
+        # Call with the lock held
+        self._roll_day()
+        args = (record['prompt_tokens'], record['completion_tokens'], record['cost'])
+        _add(self._totals, *args)
+        _add(self._by_agent.setdefault(record['agent'], _empty_totals()), *args)
+        _add(self._by_model.setdefault(record['model'], _empty_totals()), *args)
+        _add(self._by_user.setdefault(record['user'], _empty_totals()), *args)
+        if record['day'] == self._day:
+            _add(self._day_totals, *args)
+            _add(self._day_by_user.setdefault(record['user'], _empty_totals()), *args)
+
+    def record(self, agent: str, model: str, usage: Dict[str, int]) -> None:
+        """Account one completion's usage to the current request, its user, the agent and the model."""
+        request_usage = _current_request.get()
+        user = request_usage.user if request_usage is not None else 'system'
+        prompt_tokens = usage.get('prompt_tokens', 0) or 0
+        completion_tokens = usage.get('completion_tokens', 0) or 0
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        record = {
+            'ts': time.time(), 'day': _today(), 'user': user, 'agent': agent, 'model': model,
+            'request_id': request_usage.request_id if request_usage is not None else None,
+            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'cost': cost
+        }
+        if request_usage is not None:
+            _add(request_usage.totals, prompt_tokens, completion_tokens, cost)
+            _add(request_usage.by_agent.setdefault(agent, _empty_totals()), prompt_tokens, completion_tokens, cost)
+        with self._lock:
+            self._add_record(record)
+            os.makedirs(self.usage_dir, exist_ok=True)
+            with open(self._path(record['day']), "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    # Budgets
+
+    def _limits(self, user: str) -> Dict[str, float]:
+        limits = {'daily_tokens': self.user_daily_tokens, 'daily_cost': self.user_daily_cost}
+        limits.update(self.user_budgets.get(user, {}))
+        return limits
+
+    def budget_status(self, user: str) -> Dict[str, Any]:
+        """How much of today's budgets the user has used, and what that means for new calls."""
+        limits = self._limits(user)
+        with self._lock:
+            self._roll_day()
+            used = dict(self._day_by_user.get(user) or _empty_totals())
+            day_cost = self._day_totals['cost']
+        fractions = {}
+        if limits.get('daily_tokens'):
+            fractions['user_tokens'] = used['total_tokens'] / limits['daily_tokens']
+        if limits.get('daily_cost'):
+            fractions['user_cost'] = used['cost'] / limits['daily_cost']
+        if self.daily_cost:
+            fractions['agency_cost'] = day_cost / self.daily_cost
+        binding = max(fractions, key=fractions.get, default=None)
+        fraction = fractions.get(binding, 0.0)
+        if fraction >= 1:
+            state = 'refuse'
+        elif fraction >= self.downgrade_at:
+            state = 'downgrade'
+        else:
+            state = 'ok'
+        return {
+            'user': user,
+            'day': self._day,
+            'state': state,
+            'binding_budget': binding,
+            'used_fraction': round(fraction, 4),
+            'used': _rounded(used),
+            'limits': limits,
+            'agency_daily_cost_limit': self.daily_cost
+        }
+
+    def check(self, user: str) -> None:
+        """Raise BudgetExceeded if the user may not start another request today."""
+        status = self.budget_status(user)
+        if status['state'] == 'refuse':
+            scope = 'agency' if status['binding_budget'] == 'agency_cost' else 'user'
+            raise BudgetExceeded(user, scope, _seconds_until_tomorrow())
+
+    def model_for(self, model: str) -> str:
+        """The model to call for the current request: the cheaper one once its user nears a budget."""
+        request_usage = _current_request.get()
+        if request_usage is None or model == self.downgrade_model:
+            return model
+        if self.budget_status(request_usage.user)['state'] == 'ok':
+            return model
+        request_usage.downgraded = True
+        return self.downgrade_model
+
+    # Reports
+
+    def summary(self, top_users: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            self._roll_day()
+            busiest = sorted(self._day_by_user.items(), key=lambda item: item[1]['cost'], reverse=True)[:top_users]
+            return {
+                'since': self._started_at,
+                'totals': _rounded(self._totals),
+                'by_agent': {name: _rounded(t) for name, t in self._by_agent.items()},
+                'by_model': {name: _rounded(t) for name, t in self._by_model.items()},
+                'today': {
+                    'day': self._day,
+                    'totals': _rounded(self._day_totals),
+                    'top_users': {user: _rounded(t) for user, t in busiest}
+                },
+                'budgets': {
+                    'user_daily_tokens': self.user_daily_tokens,
+                    'user_daily_cost': self.user_daily_cost,
+                    'agency_daily_cost': self.daily_cost,
+                    'downgrade_at': self.downgrade_at,
+                    'downgrade_model': self.downgrade_model
+                }
+            }
+
+    def user_summary(self, user: str) -> Dict[str, Any]:
+        with self._lock:
+            totals = _rounded(self._by_user.get(user) or _empty_totals())
+        return {'user': user, 'totals': totals, 'budget': self.budget_status(user)}
+
+_usage_ledger: Optional[UsageLedger] = None
+
+def get_usage_ledger() -> UsageLedger:
+    """Return the process-wide usage ledger, configured from the environment."""
+    global _usage_ledger
+    if _usage_ledger is None:
+        _usage_ledger = UsageLedger(
+            usage_dir=os.getenv('USAGE_DIR', DEFAULT_USAGE_DIR),
+            user_daily_tokens=int(os.getenv('USAGE_USER_DAILY_TOKENS', '0')),
+            user_daily_cost=float(os.getenv('USAGE_USER_DAILY_COST', '0')),
+            daily_cost=float(os.getenv('USAGE_DAILY_COST', '0')),
+            downgrade_at=float(os.getenv('USAGE_DOWNGRADE_AT', '0.8')),
+            downgrade_model=os.getenv('USAGE_DOWNGRADE_MODEL', 'gpt-4o-mini'),
+            user_budgets=json.loads(os.getenv('USAGE_USER_BUDGETS', '{}'))
+        )
+    return _usage_ledger
+
+if __name__ == "__main__":
+    # Example usage: a user with a 2,000-token daily budget making calls until refused
+    import tempfile
+
+    ledger = UsageLedger(tempfile.mkdtemp(), user_daily_tokens=2000)
+    for i in range(6):
+        try:
+            ledger.check("alice")
+        except BudgetExceeded as e:
+            print(f"request {i}: refused ({e})")
+            continue
+        with ledger.request_scope("alice") as request_usage:
+            model = ledger.model_for("gpt-4")
+            ledger.record("health_agent", model, {'prompt_tokens': 400, 'completion_tokens': 150})
+        print(f"request {i}: {model}, {request_usage.totals['total_tokens']} tokens, ${request_usage.totals['cost']:.4f}")
+    print(ledger.user_summary("alice"))
@@ -0,0 +1,204 @@
+"""
+Long-term memory of durable facts about each user.
+
+Facts such as goals, family members and constraints are extracted from the
+user's messages with simple first-person patterns and stored per user in an
+append-only JSONL file. Each fact is embedded as a sparse, L2-normalised
+hashed bag of words and bigrams, so no model is needed. Retrieval scores
+every fact sharing a feature with the query in one NumPy pass over the
+postings of the query's hash buckets, which keeps it to a few milliseconds
+at 100k facts where a dense matrix product would not.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from life_management_agency.knowledge_agent.knowledge_index import tokenize
+
+DEFAULT_MEMORY_DIR = os.path.join(os.path.dirname(__file__), "data", "user_memory")
+
+# First-person statements worth remembering, by category
+FACT_PATTERNS = {
+    'goal': re.compile(r"\b(my goal|i want to|i'd like to|i would like to|i'm trying to|i am trying to|i plan to|i hope to)\b"),
+    'family': re.compile(r"\bmy (wife|husband|partner|son|daughter|kids?|children|mom|mother|dad|father|sister|brother|family|grandma|grandpa)\b"),
+    'constraint': re.compile(r"\b(i can't|i cannot|i'm allergic|i am allergic|i don't eat|i do not eat|i have (a|an) (injury|condition)|i'm (vegan|vegetarian)|i am (vegan|vegetarian)|i only have)\b"),
+    'preference': re.compile(r"\b(i prefer|i like|i love|i hate|i don't like|i enjoy)\b"),
+    'routine': re.compile(r"\b(i usually|i always|i work|i wake up|i go to bed|every (morning|evening|day|week))\b"),
+}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def extract_facts(message: str, max_chars: int = 300) -> List[Dict[str, str]]:
+    """Durable first-person facts in a message, one per matching sentence."""
+    facts = []
+    for sentence in _SENTENCE_RE.split(message):
+        sentence = sentence.strip()
+        lowered = sentence.lower()
+        if len(sentence.split()) < 3 or lowered.endswith('?'):
+            continue
+        for category, pattern in FACT_PATTERNS.items():
+            if pattern.search(lowered):
+                facts.append({'text': sentence[:max_chars], 'category': category})
+                break
+    return facts
+
+def embed(text: str, dim: int) -> Dict[int, float]:
+    """Sparse L2-normalised feature-hashing vector over words and word bigrams, as {bucket: weight}."""
+    tokens = tokenize(text)
+    vector: Dict[int, float] = {}
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        bucket = zlib.crc32(feature.encode()) % dim
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = sum(weight * weight for weight in vector.values()) ** 0.5
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+class _UserFacts:
+    """One user's facts and the postings of their hashed feature vectors."""
+
+    def __init__(self):
+        self.facts: List[Dict[str, Any]] = []
+        self.keys: set = set()
+        # bucket -> (fact ids, weights), read by NumPy without copying
+        self.postings: Dict[int, Tuple[array, array]] = {}
+
+    def add(self, fact: Dict[str, Any], vector: Dict[int, float]) -> None:
+        fact_id = len(self.facts)
+        for bucket, weight in vector.items():
+            ids, weights = self.postings.setdefault(bucket, (array('i'), array('f')))
+            ids.append(fact_id)
+            weights.append(weight)
+        self.facts.append(fact)
+        self.keys.add(fact['key'])
+
+class UserMemoryStore:
+    """Per-user fact store with a hashed-feature vector index."""
+
+    def __init__(self, memory_dir: str = DEFAULT_MEMORY_DIR, dim: int = 1 << 20):
+        self.memory_dir = memory_dir
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._users: Dict[str, _UserFacts] = {}
+
+    def _path(self, user: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", user)
+        suffix = hashlib.sha1(user.encode()).hexdigest()[:8]
+        return os.path.join(self.memory_dir, f"{safe_name}-{suffix}.jsonl")
+
+    def _load(self, user: str) -> _UserFacts:
+        """The user's facts, read from disk on first use. Call with the lock held."""
+        entry = self._users.get(user)
+        if entry is not None:
+            return entry
+        entry = _UserFacts()
+        path = self._path(user)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        fact = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if fact['key'] not in entry.keys:
+                        entry.add(fact, embed(fact['text'], self.dim))
+        self._users[user] = entry
+        return entry
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(' '.join(tokenize(text)).encode()).hexdigest()
+
+    def remember(self, user: str, text: str, category: str = 'general', source: str = 'conversation') -> Optional[Dict[str, Any]]:
+        """Store a fact unless an equivalent one is already known. Returns the stored fact."""
+        fact = {'key': self._key(text), 'text': text, 'category': category,
+                'source': source, 'created_at': time.time()}
+        vector = embed(text, self.dim)
+        with self._lock:
+            entry = self._load(user)
+            if fact['key'] in entry.keys:
+                return None
+            os.makedirs(self.memory_dir, exist_ok=True)
+            with open(self._path(user), "a") as f:
+                f.write(json.dumps(fact) + "\n")
+            entry.add(fact, vector)
+        return fact
+
+    def remember_from_message(self, user: str, message: str) -> List[Dict[str, Any]]:
+        """Extract facts from a user message and store the new ones."""
+        stored = []
+        for fact in extract_facts(message):
+            result = self.remember(user, fact['text'], fact['category'])
+            if result is not None:
+                stored.append(result)
+        return stored
+
+    def recall(self, user: str, query: str, k: int = 5, min_score: float = 0.05) -> List[Dict[str, Any]]:
+        """The k facts most similar to the query, best first."""
+        query_vector = embed(query, self.dim)
+        with self._lock:
+            entry = self._load(user)
+            count = len(entry.facts)
+            ids, weights = [], []
+            for bucket, query_weight in query_vector.items():
+                postings = entry.postings.get(bucket)
+                if postings is not None:
+                    ids.append(np.frombuffer(postings[0], dtype=np.int32))
+                    weights.append(np.frombuffer(postings[1], dtype=np.float32) * query_weight)
+            if not ids:
+                return []
+            # Copy out of the postings while locked: arrays exporting buffers cannot grow
+            ids = np.concatenate(ids)
+            weights = np.concatenate(weights)
+            facts = entry.facts
+        # Cosine similarity of the query with every fact that shares a feature with it
+        scores = np.bincount(ids, weights=weights, minlength=count)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {'text': facts[i]['text'], 'category': facts[i]['category'], 'score': float(scores[i])}
+            for i in top if scores[i] >= min_score
+        ]
+
+    def count(self, user: str) -> int:
+        with self._lock:
+            return len(self._load(user).facts)
+
+_user_memory: Optional[UserMemoryStore] = None
+
+def get_user_memory() -> UserMemoryStore:
+    """Return the process-wide user memory store."""
+    global _user_memory
+    if _user_memory is None:
+        _user_memory = UserMemoryStore()
+    return _user_memory
+
+if __name__ == "__main__":
+    # Example usage and retrieval latency at 100k facts
+    import random
+    import tempfile
+
+    store = UserMemoryStore(tempfile.mkdtemp())
+    store.remember_from_message("user", "My goal is to run a half marathon in May. My daughter Emma starts school in the fall. I'm allergic to peanuts.")
+
+    words = ("sleep run swim family dinner budget meeting yoga garden read piano coffee "
+             "travel project son daughter work stress diet protein walk").split()
+    entry = store._load("user")
+    for i in range(100_000):
+        text = f"fact {i} " + " ".join(random.choices(words, k=6))
+        entry.add({'key': str(i), 'text': text, 'category': 'general'}, embed(text, store.dim))
+
+    print(store.recall("user", "what should I eat before my marathon training?", k=3))
+    runs = 100
+    start = time.perf_counter()
+    for _ in range(runs):
+        store.recall("user", "help me plan time with my daughter", k=5)
+    print(f"recall over {store.count('user')} facts: {(time.perf_counter() - start) / runs * 1000:.2f} ms")
@@ -9,6 +9,9 @@ setup(
         'pydantic',
         'python-dotenv',
         'tavily-python',
+        'httpx',
+        'orjson',
+        'numpy',
         'openai',  # Required for OpenRouter compatibility
         'requests'  # Required for API calls
     ],